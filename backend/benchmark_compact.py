@@ -0,0 +1,137 @@
+"""Compare compact (float16/int8) vector search with the Chroma retrieval path.
+
+For each corpus size this reports the footprint of a persistent Chroma
+collection (process memory growth and directory size) and, per quantization
+mode, the memory held by the codes and the size of the memory-mapped float32
+file, recall@k against brute force, overlap with the results Chroma returns
+for the same queries, and query latency.
+
+The compact index is built from the vectors stored in Chroma, so in the server
+its footprint adds to Chroma's: the total columns show both together.
+Process memory is measured from the resident set size (Linux only) and is
+approximate, since freed memory is not always returned to the OS.
+
+Example:
+    python benchmark_compact.py --sizes 10000 100000 --rescore-factor 2 4 8
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import chromadb
+
+from compact_index import QUANTIZATION_MODES, CompactVectorIndex
+from synthetic_vectors import brute_force, generate_corpus, generate_queries
+
+
+def resident_bytes():
+    """Resident set size of this process, or None where /proc is not available"""
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def directory_size(path):
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path)
+        for name in names
+    )
+
+
+def chroma_results(vectors, queries, k):
+    """Index the corpus in a persistent Chroma collection, query it and measure its footprint"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        rss_before = resident_bytes()
+        client = chromadb.PersistentClient(path=tmp_dir)
+        collection = client.create_collection(
+            f"benchmark_{len(vectors)}",
+            metadata={"hnsw:space": "cosine", "hnsw:search_ef": 64}
+        )
+        ids = [str(i) for i in range(len(vectors))]
+        batch_size = client.get_max_batch_size()
+        for start in range(0, len(vectors), batch_size):
+            collection.add(
+                ids=ids[start:start + batch_size],
+                embeddings=vectors[start:start + batch_size].tolist()
+            )
+        start = time.perf_counter()
+        results = collection.query(query_embeddings=queries.tolist(), n_results=k, include=[])
+        latency = (time.perf_counter() - start) * 1000 / len(queries)
+        rss_after = resident_bytes()
+        footprint = {
+            "memory_bytes": rss_after - rss_before if rss_before is not None else None,
+            "disk_bytes": directory_size(tmp_dir),
+        }
+        client.delete_collection(collection.name)
+    return [[int(id_) for id_ in row] for row in results["ids"]], latency, footprint
+
+
+def megabytes(size):
+    return "-" if size is None else f"{size / 1024 / 1024:.1f}"
+
+
+def overlap(results, reference):
+    """Fraction of reference results also returned, averaged over queries"""
+    hits = sum(len(set(got) & set(expected)) for got, expected in zip(results, reference))
+    return hits / sum(len(expected) for expected in reference)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--modes", nargs="+", default=list(QUANTIZATION_MODES), choices=QUANTIZATION_MODES)
+    parser.add_argument("--rescore-factor", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--skip-chroma", action="store_true", help="Only compare against brute force")
+    args = parser.parse_args()
+
+    print("chunks | index | rescore | memory_mb | disk_mb | total_memory_mb | total_disk_mb | "
+          "recall@k | chroma_overlap | ms/query")
+    for size in args.sizes:
+        vectors, centers = generate_corpus(size)
+        queries = generate_queries(centers, args.queries)
+        truth = brute_force(vectors, queries, args.k).tolist()
+        ids = list(range(size))
+
+        chroma_overlap = None
+        chroma_footprint = {"memory_bytes": None, "disk_bytes": None}
+        if not args.skip_chroma:
+            chroma_ids, chroma_latency, chroma_footprint = chroma_results(vectors, queries, args.k)
+            chroma_recall = overlap(chroma_ids, truth)
+            memory_mb = megabytes(chroma_footprint["memory_bytes"])
+            disk_mb = megabytes(chroma_footprint["disk_bytes"])
+            print(f"{size} | chroma | - | {memory_mb} | {disk_mb} | {memory_mb} | {disk_mb} | "
+                  f"{chroma_recall:.4f} | 1.0000 | {chroma_latency:.3f}")
+
+        for mode in args.modes:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                index = CompactVectorIndex(vectors.shape[1], mode=mode, path=f"{tmp_dir}/vectors.f32")
+                index.add(ids, vectors)
+                usage = index.memory_usage()
+                totals = {
+                    key: chroma_footprint[key] + usage[own] if chroma_footprint[key] is not None else None
+                    for key, own in (("memory_bytes", "compact_bytes"), ("disk_bytes", "disk_bytes"))
+                }
+                for rescore_factor in args.rescore_factor:
+                    index.rescore_factor = rescore_factor
+                    start = time.perf_counter()
+                    results = [[id_ for id_, _ in index.search(query, args.k)] for query in queries]
+                    latency = (time.perf_counter() - start) * 1000 / len(queries)
+                    if not args.skip_chroma:
+                        chroma_overlap = f"{overlap(results, chroma_ids):.4f}"
+                    print(
+                        f"{size} | chroma+{mode} | {rescore_factor} | {megabytes(usage['compact_bytes'])} | "
+                        f"{megabytes(usage['disk_bytes'])} | {megabytes(totals['memory_bytes'])} | "
+                        f"{megabytes(totals['disk_bytes'])} | "
+                        f"{overlap(results, truth):.4f} | {chroma_overlap or '-'} | {latency:.3f}",
+                        flush=True
+                    )
+                index.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Benchmark extraction and chunking throughput per upload format.
+
+Without arguments it generates equivalent synthetic HR handbooks as text,
+Markdown, HTML and DOCX. Pass --files to benchmark real documents instead.
+Embedding time is not included; this measures the extract + chunk stage only.
+
+Example:
+    python benchmark_extractors.py --sections 2000
+    python benchmark_extractors.py --files handbook.docx policies.html
+"""
+import argparse
+import io
+import os
+import time
+
+from chunking import chunk_document
+from extractors import get_extractor
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+
+TOPICS = ["Leave Policy", "Working Hours", "Benefits", "Password Resets", "VPN Access", "Security Incidents"]
+SENTENCE = "Employees should follow the documented process and contact the {topic} team with any questions."
+
+
+def synthetic_handbook(n_sections):
+    """Yield (heading, paragraphs, list items, table rows) for each section"""
+    for i in range(n_sections):
+        topic = TOPICS[i % len(TOPICS)]
+        paragraphs = [" ".join(SENTENCE.format(topic=topic) for _ in range(4)) for _ in range(3)]
+        items = [f"Step {j + 1} for {topic.lower()} requests" for j in range(4)]
+        rows = [["Type", "Days"], ["Casual", "12"], ["Sick", "10"]]
+        yield f"{topic} {i}", paragraphs, items, rows
+
+
+def build_documents(n_sections):
+    sections = list(synthetic_handbook(n_sections))
+    text, markdown, html = [], [], ["<html><body>"]
+    for heading, paragraphs, items, rows in sections:
+        text += [heading, ""] + [p + "\n" for p in paragraphs] + items + [""]
+        markdown += [f"## {heading}", ""] + [p + "\n" for p in paragraphs]
+        markdown += [f"- {item}" for item in items] + [""]
+        markdown += [f"| {' | '.join(row)} |" for row in rows[:1]] + ["| --- | --- |"]
+        markdown += [f"| {' | '.join(row)} |" for row in rows[1:]] + [""]
+        html.append(f"<h2>{heading}</h2>" + "".join(f"<p>{p}</p>" for p in paragraphs))
+        html.append("<ul>" + "".join(f"<li>{item}</li>" for item in items) + "</ul>")
+        html.append("<table>" + "".join(
+            "<tr>" + "".join(f"<td>{cell}</td>" for cell in row) + "</tr>" for row in rows
+        ) + "</table>")
+    html.append("</body></html>")
+    documents = {
+        ".txt": "\n".join(text).encode("utf-8"),
+        ".md": "\n".join(markdown).encode("utf-8"),
+        ".html": "".join(html).encode("utf-8"),
+    }
+
+    try:
+        from docx import Document
+    except ImportError:
+        print("python-docx not installed, skipping DOCX")
+        return documents
+    document = Document()
+    for heading, paragraphs, items, rows in sections:
+        document.add_heading(heading, 2)
+        for paragraph in paragraphs:
+            document.add_paragraph(paragraph)
+        for item in items:
+            document.add_paragraph(item, style="List Bullet")
+        table = document.add_table(rows=len(rows), cols=len(rows[0]))
+        for r, row in enumerate(rows):
+            for c, cell in enumerate(row):
+                table.cell(r, c).text = cell
+    buffer = io.BytesIO()
+    document.save(buffer)
+    documents[".docx"] = buffer.getvalue()
+    return documents
+
+
+def benchmark(name, extension, content, repeat):
+    extractor = get_extractor(extension)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        chunks = list(chunk_document(extractor(content), "character", CHUNK_SIZE, CHUNK_OVERLAP))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    average = sum(len(chunk) for chunk in chunks) / len(chunks) if chunks else 0
+    print(f"{name} | {extractor.__name__} | {len(content) / 1024 / 1024:.2f} | {len(chunks)} | "
+          f"{average:.0f} | {best * 1000:.1f} | {len(content) / 1024 / 1024 / best:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", nargs="+", help="Benchmark these files instead of synthetic documents")
+    parser.add_argument("--sections", type=int, default=1000, help="Sections per synthetic document")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per document, the best is reported")
+    args = parser.parse_args()
+
+    print("document | extractor | size_mb | chunks | avg_chunk_chars | ms | mb_per_s")
+    if args.files:
+        for path in args.files:
+            with open(path, "rb") as file:
+                benchmark(os.path.basename(path), os.path.splitext(path)[1], file.read(), args.repeat)
+    else:
+        for extension, content in build_documents(args.sections).items():
+            benchmark(f"synthetic{extension}", extension, content, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
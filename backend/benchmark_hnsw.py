@@ -0,0 +1,97 @@
+"""Benchmark HNSW parameters: recall@k against brute force, query latency and index memory.
+
+Builds synthetic clustered corpora of normalized 384-d vectors (the shape of
+all-MiniLM-L6-v2 embeddings) and indexes them with hnswlib, the library Chroma
+uses under the hood, so the numbers carry over to the hnsw:* collection metadata
+configured in main.py.
+
+Example:
+    python benchmark_hnsw.py --sizes 10000 100000 1000000 --m 16 32 --search-ef 16 32 64
+"""
+import argparse
+import csv
+import os
+import tempfile
+import time
+
+import numpy as np
+
+try:
+    import hnswlib
+except ImportError:
+    raise SystemExit("hnswlib is required: pip install chroma-hnswlib (see requirements.txt)")
+
+from synthetic_vectors import BATCH_SIZE, brute_force, generate_corpus, generate_queries
+
+
+def build_index(vectors, space, m, construction_ef):
+    """Build an HNSW index, returning it with its build time and size in bytes"""
+    index = hnswlib.Index(space=space, dim=vectors.shape[1])
+    index.init_index(max_elements=len(vectors), ef_construction=construction_ef, M=m)
+    start = time.perf_counter()
+    for batch_start in range(0, len(vectors), BATCH_SIZE):
+        batch = vectors[batch_start:batch_start + BATCH_SIZE]
+        index.add_items(batch, np.arange(batch_start, batch_start + len(batch)))
+    build_time = time.perf_counter() - start
+
+    # The serialized index mirrors the in-memory layout (vectors + link lists)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "index.bin")
+        index.save_index(path)
+        memory = os.path.getsize(path)
+    return index, build_time, memory
+
+
+def evaluate(index, queries, truth, k, search_ef):
+    """Return recall@k and per-query latency percentiles in milliseconds"""
+    index.set_ef(max(search_ef, k))
+    latencies = []
+    hits = 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        labels, _ = index.knn_query(query, k=k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len(set(labels[0]) & set(expected))
+    latencies = np.asarray(latencies)
+    return hits / truth.size, np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--space", default="cosine", choices=["cosine", "ip", "l2"])
+    parser.add_argument("--m", type=int, nargs="+", default=[16, 32])
+    parser.add_argument("--construction-ef", type=int, nargs="+", default=[100, 200])
+    parser.add_argument("--search-ef", type=int, nargs="+", default=[10, 32, 64, 128])
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--csv", help="Also write the results to this CSV file")
+    args = parser.parse_args()
+
+    header = ["chunks", "M", "construction_ef", "search_ef", "recall@k", "p50_ms", "p99_ms", "build_s", "index_mb"]
+    rows = []
+    print(" | ".join(header))
+    for size in args.sizes:
+        vectors, centers = generate_corpus(size)
+        queries = generate_queries(centers, args.queries)
+        truth = brute_force(vectors, queries, args.k)
+        for m in args.m:
+            for construction_ef in args.construction_ef:
+                index, build_time, memory = build_index(vectors, args.space, m, construction_ef)
+                for search_ef in args.search_ef:
+                    recall, p50, p99 = evaluate(index, queries, truth, args.k, search_ef)
+                    row = [size, m, construction_ef, search_ef, f"{recall:.4f}", f"{p50:.3f}",
+                           f"{p99:.3f}", f"{build_time:.1f}", f"{memory / 1024 / 1024:.1f}"]
+                    rows.append(row)
+                    print(" | ".join(str(value) for value in row), flush=True)
+                del index
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(header)
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Chunking strategies for uploaded documents.
+
+All strategies keep the heading-aware grouping done by chunk_sections, and
+chunk sizes include the heading each chunk starts with. They differ in how
+size is measured and where oversized groups are cut:
+
+- character: sizes in characters, recursive splitting on paragraphs, lines,
+  then words (the original behaviour)
+- token: sizes in tokens of the embedding model's own tokenizer, so chunks
+  never exceed what the model actually reads (all-MiniLM-L6-v2 truncates
+  input at 256 tokens, [CLS] and [SEP] included)
+- sentence: sizes in characters, but cuts only at paragraph, line or
+  sentence boundaries before falling back to words
+"""
+from functools import lru_cache
+from typing import Iterable, Iterator
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from extractors import Section, chunk_sections
+
+CHUNKING_STRATEGIES = ("character", "token", "sentence")
+# Default (chunk_size, chunk_overlap) per strategy, token sizes are in tokens
+DEFAULT_CHUNK_PARAMETERS = {
+    "character": (1000, 200),
+    "token": (254, 32),  # 254 + [CLS] and [SEP] = the 256 tokens all-MiniLM-L6-v2 reads
+    "sentence": (1000, 200),
+}
+DEFAULT_EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+# Lookbehind keeps the punctuation with its sentence
+SENTENCE_SEPARATORS = [r"\n\n", r"\n", r"(?<=[.!?])\s+", r"(?<=[;:])\s+", r"\s+", ""]
+
+
+def tokenizer_name(embedding_model: str) -> str:
+    """Hugging Face repository of an embedding model's tokenizer.
+
+    Bare names are resolved the way sentence-transformers resolves them.
+    """
+    return embedding_model if "/" in embedding_model else f"sentence-transformers/{embedding_model}"
+
+
+@lru_cache(maxsize=None)
+def get_tokenizer(embedding_model: str = DEFAULT_EMBEDDING_MODEL):
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(tokenizer_name(embedding_model))
+
+
+def token_length(text: str, embedding_model: str = DEFAULT_EMBEDDING_MODEL) -> int:
+    """Number of tokens the embedding model's tokenizer produces for text"""
+    return len(get_tokenizer(embedding_model).encode(text, add_special_tokens=False))
+
+
+def make_splitter(strategy: str, chunk_size: int, chunk_overlap: int,
+                  embedding_model: str = DEFAULT_EMBEDDING_MODEL):
+    """Return the (splitter, length_function) pair for a chunking strategy.
+
+    The token strategy counts tokens with embedding_model's tokenizer.
+    """
+    if strategy == "character":
+        splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        return splitter, len
+    if strategy == "token":
+        splitter = RecursiveCharacterTextSplitter.from_huggingface_tokenizer(
+            get_tokenizer(embedding_model),
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap
+        )
+        return splitter, lambda text: token_length(text, embedding_model)
+    if strategy == "sentence":
+        splitter = RecursiveCharacterTextSplitter(
+            separators=SENTENCE_SEPARATORS,
+            is_separator_regex=True,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap
+        )
+        return splitter, len
+    raise ValueError(f"Unknown chunking strategy: {strategy}. Expected one of {CHUNKING_STRATEGIES}")
+
+
+def chunk_document(sections: Iterable[Section], strategy: str, chunk_size: int, chunk_overlap: int,
+                   embedding_model: str = DEFAULT_EMBEDDING_MODEL) -> Iterator[str]:
+    """Chunk extracted sections with the given strategy, yielding chunks as they are ready"""
+    @lru_cache(maxsize=None)
+    def splitter_for(size):
+        # Bodies under a heading get a smaller budget, the overlap must stay below it
+        return make_splitter(strategy, size, min(chunk_overlap, size // 2), embedding_model)
+
+    _, length_function = splitter_for(chunk_size)
+    return chunk_sections(sections, lambda size: splitter_for(size)[0], chunk_size, length_function)
@@ -0,0 +1,149 @@
+"""Compact vector index: quantized candidate search with exact re-scoring.
+
+Vectors are kept in memory as float16 or int8 codes (2x / ~4x smaller than
+float32). A query scores every code, keeps the best k * rescore_factor
+candidates and re-scores them exactly against the full float32 vectors, which
+live in a memory-mapped file so only the rows that are touched get paged in.
+Each index owns its file: row numbers are per instance, so two indexes (or two
+worker processes) must never share a path.
+Embeddings are normalized, so scores are cosine similarities.
+"""
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+QUANTIZATION_MODES = ("float16", "int8")
+SCORE_BLOCK_SIZE = 65536  # Rows dequantized at a time while scoring
+
+
+class CompactVectorIndex:
+    def __init__(self, dimension, mode="int8", path=None, rescore_factor=4, initial_capacity=1024):
+        if mode not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization mode: {mode}. Expected one of {QUANTIZATION_MODES}")
+        self.dimension = dimension
+        self.mode = mode
+        self.rescore_factor = rescore_factor
+        # Without a path the vectors go to a private temporary directory, removed on close(remove=True)
+        self._temp_dir = None
+        if path is None:
+            self._temp_dir = tempfile.mkdtemp(prefix="compact_index_")
+            path = os.path.join(self._temp_dir, "vectors.f32")
+        self.path = path
+        self.ids = []
+        self._rows = {}
+        self._capacity = 0
+        code_dtype = np.int8 if mode == "int8" else np.float16
+        self._codes = np.empty((0, dimension), dtype=code_dtype)
+        self._scales = np.empty(0, dtype=np.float32)
+        self._vectors = None
+        self._reserve(initial_capacity)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _reserve(self, capacity):
+        """Grow the code arrays and the memory-mapped float32 file.
+
+        search() runs without a lock, so the grown arrays are built completely
+        before each is swapped in with a single assignment. Readers holding the
+        old arrays keep valid views: the file only grows, and the old memmap is
+        released by reference counting once they are done with it.
+        """
+        if capacity <= self._capacity:
+            return
+        capacity = max(capacity, self._capacity * 2)
+        count = len(self)
+        codes = np.empty((capacity, self.dimension), dtype=self._codes.dtype)
+        codes[:count] = self._codes[:count]
+        scales = np.empty(capacity, dtype=np.float32)
+        scales[:count] = self._scales[:count]
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if self._vectors is not None:
+            self._vectors.flush()
+        with open(self.path, "ab") as file:
+            file.truncate(capacity * self.dimension * 4)
+        vectors = np.memmap(self.path, dtype=np.float32, mode="r+", shape=(capacity, self.dimension))
+
+        self._codes = codes
+        self._scales = scales
+        self._vectors = vectors
+        self._capacity = capacity
+
+    def _quantize(self, vectors):
+        if self.mode == "float16":
+            return vectors.astype(np.float16), np.ones(len(vectors), dtype=np.float32)
+        # Symmetric per-vector scale, so incremental adds never need re-training
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    def add(self, ids, embeddings):
+        """Add vectors, ignoring ids that are already indexed (like Chroma's add)"""
+        new = [(id_, embedding) for id_, embedding in zip(ids, embeddings) if id_ not in self._rows]
+        if not new:
+            return 0
+        vectors = np.asarray([embedding for _, embedding in new], dtype=np.float32)
+        start = len(self)
+        end = start + len(vectors)
+        self._reserve(end)
+        self._codes[start:end], self._scales[start:end] = self._quantize(vectors)
+        self._vectors[start:end] = vectors
+        for offset, (id_, _) in enumerate(new):
+            self._rows[id_] = start + offset
+            self.ids.append(id_)
+        return len(new)
+
+    def _approximate_scores(self, query, count):
+        codes, scales = self._codes, self._scales
+        scores = np.empty(count, dtype=np.float32)
+        for start in range(0, count, SCORE_BLOCK_SIZE):
+            end = min(start + SCORE_BLOCK_SIZE, count)
+            scores[start:end] = codes[start:end].astype(np.float32) @ query
+        return scores * scales[:count]
+
+    def search(self, query_embedding, k):
+        """Return the top-k (id, score) pairs, re-scored with full precision"""
+        # Rows below count are fully written before their id is appended, so a
+        # search concurrent with add() only ever sees complete rows
+        count = len(self)
+        if count == 0:
+            return []
+        vectors = self._vectors
+        query = np.asarray(query_embedding, dtype=np.float32)
+        scores = self._approximate_scores(query, count)
+        n_candidates = min(count, max(k, k * self.rescore_factor))
+        candidates = np.argpartition(-scores, n_candidates - 1)[:n_candidates]
+        candidates.sort()  # Sequential reads from the memory-mapped file
+        exact = vectors[candidates] @ query
+        order = np.argsort(-exact)[:k]
+        return [(self.ids[candidates[i]], float(exact[i])) for i in order]
+
+    def get_vectors(self, ids):
+        """Return the full-precision vectors for the given ids"""
+        return self._vectors[[self._rows[id_] for id_ in ids]]
+
+    def memory_usage(self):
+        """Bytes held in memory by the codes versus a plain float32 copy"""
+        count = len(self)
+        compact = self._codes[:count].nbytes + (self._scales[:count].nbytes if self.mode == "int8" else 0)
+        return {
+            "vectors": count,
+            "compact_bytes": compact,
+            "float32_bytes": count * self.dimension * 4,
+            "disk_bytes": os.path.getsize(self.path),
+        }
+
+    def close(self, remove=False):
+        """Flush the memory-mapped vectors, optionally deleting the file"""
+        if self._vectors is not None:
+            self._vectors.flush()
+            del self._vectors
+            self._vectors = None
+        if remove and os.path.exists(self.path):
+            os.remove(self.path)
+        if remove and self._temp_dir is not None:
+            shutil.rmtree(self._temp_dir, ignore_errors=True)
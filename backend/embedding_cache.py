@@ -0,0 +1,176 @@
+"""Two-tier cache for query embeddings.
+
+An in-process LRU sits in front of a SQLite database that every worker on the
+node opens, so a question embedded by one worker (or before a restart) is a
+hit for all of them. Entries are keyed by the embedding model id and the
+normalised question text. Hit and miss counters are kept in the same file,
+per model, so the reported hit rate covers every worker on the node.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+PRUNE_INTERVAL = 500  # Disk inserts between size checks
+STATS_FLUSH_LOOKUPS = 100  # Lookups counted in process before adding them to the shared counters
+STATS_FLUSH_SECONDS = 10  # ...or seconds since the last flush, whichever comes first
+STAT_NAMES = ("memory_hits", "disk_hits", "misses")
+
+
+def normalize_text(text: str, lowercase: bool = False) -> str:
+    """Normalise a question for cache lookups.
+
+    Collapsing whitespace never changes the embedding, since tokenizers ignore
+    whitespace runs. Lowercasing is only safe for models whose tokenizer
+    lowercases its input (uncased models such as all-MiniLM-L6-v2).
+    """
+    text = " ".join(text.split())
+    return text.lower() if lowercase else text
+
+
+def tokenizer_lowercases(tokenizer) -> bool:
+    """Whether a Hugging Face tokenizer lowercases its input"""
+    if getattr(tokenizer, "do_lower_case", None) is not None:
+        return bool(tokenizer.do_lower_case)
+    return bool((getattr(tokenizer, "init_kwargs", None) or {}).get("do_lower_case", False))
+
+
+class EmbeddingCache:
+    def __init__(self, embed_fn, model_id, path, memory_size=1000, disk_size=100000, lowercase=False):
+        """lowercase must only be set when the model's tokenizer lowercases its input"""
+        self.embed_fn = embed_fn
+        self.model_id = model_id
+        self.lowercase = lowercase
+        self.path = path
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._inserts = 0
+        self.stats = dict.fromkeys(STAT_NAMES, 0)  # This process since start
+        self._pending = dict.fromkeys(STAT_NAMES, 0)  # Not yet added to the shared counters
+        self._flushed = time.time()
+
+        self._db = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS stats ("
+            "model_id TEXT NOT NULL, name TEXT NOT NULL, value INTEGER NOT NULL, "
+            "PRIMARY KEY (model_id, name))"
+        )
+        self._db.commit()
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_id}\0{normalize_text(text, self.lowercase)}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _read_disk(self, key):
+        with self._lock:
+            row = self._db.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE embeddings SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+        return np.frombuffer(row[0], dtype=np.float32).tolist()
+
+    def _write_disk(self, key, vector):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                (key, np.asarray(vector, dtype=np.float32).tobytes(), time.time())
+            )
+            self._inserts += 1
+            if self._inserts % PRUNE_INTERVAL == 0:
+                self._prune()
+            self._db.commit()
+
+    def _prune(self):
+        """Drop the least recently used rows beyond disk_size"""
+        count = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        if count > self.disk_size:
+            self._db.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                (count - self.disk_size,)
+            )
+
+    def _count(self, name):
+        """Count a lookup outcome, adding the pending counts to the shared ones now and then.
+
+        Called with self._lock held.
+        """
+        self.stats[name] += 1
+        self._pending[name] += 1
+        if (
+            sum(self._pending.values()) >= STATS_FLUSH_LOOKUPS
+            or time.time() - self._flushed >= STATS_FLUSH_SECONDS
+        ):
+            self._flush_stats()
+
+    def _flush_stats(self):
+        """Add this process's pending counts to the shared counters. Called with self._lock held."""
+        self._db.executemany(
+            "INSERT INTO stats (model_id, name, value) VALUES (?, ?, ?) "
+            "ON CONFLICT (model_id, name) DO UPDATE SET value = value + excluded.value",
+            [(self.model_id, name, value) for name, value in self._pending.items() if value]
+        )
+        self._db.commit()
+        self._pending = dict.fromkeys(STAT_NAMES, 0)
+        self._flushed = time.time()
+
+    def embed(self, text: str):
+        """Return the embedding for text, computing it only on a miss in both tiers"""
+        key = self._key(text)
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self._count("memory_hits")
+                return vector
+
+        vector = self._read_disk(key)
+        if vector is not None:
+            with self._lock:
+                self._count("disk_hits")
+                self._remember(key, vector)
+            return vector
+
+        vector = self.embed_fn(text)
+        self._write_disk(key, vector)
+        with self._lock:
+            self._count("misses")
+            self._remember(key, vector)
+        return vector
+
+    def get_stats(self) -> dict:
+        """Hit counts and rates for all workers on the node, plus this worker's own.
+
+        Other workers' counts lag by up to STATS_FLUSH_LOOKUPS lookups or
+        STATS_FLUSH_SECONDS seconds each.
+        """
+        with self._lock:
+            self._flush_stats()
+            rows = self._db.execute("SELECT name, value FROM stats WHERE model_id = ?", (self.model_id,))
+            shared = dict.fromkeys(STAT_NAMES, 0)
+            shared.update(rows.fetchall())
+            worker = dict(self.stats, pid=os.getpid(), memory_entries=len(self._memory))
+            disk_entries = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        for counts in (shared, worker):
+            lookups = sum(counts[name] for name in STAT_NAMES)
+            counts["hit_rate"] = (counts["memory_hits"] + counts["disk_hits"]) / lookups if lookups else 0.0
+        return dict(shared, disk_entries=disk_entries, worker=worker)
@@ -0,0 +1,325 @@
+"""Extractor registry turning uploaded files into structure-aware sections.
+
+Each extractor is a generator that yields Section tuples (headings, list
+items, table rows, paragraphs, pages) as it reads the file, so chunking can
+start before the whole document has been parsed. Extractors are looked up by
+file extension first and MIME type second, with plain text as the fallback.
+"""
+import io
+import re
+from html.parser import HTMLParser
+from typing import Callable, Dict, Iterable, Iterator, NamedTuple, Optional
+
+import PyPDF2
+
+
+class Section(NamedTuple):
+    kind: str  # "heading", "paragraph", "list_item", "table_row", "code" or "page"
+    text: str
+    heading: str  # Closest heading above this section ("" before the first one)
+
+
+Extractor = Callable[[bytes], Iterator[Section]]
+
+EXTRACTORS_BY_EXTENSION: Dict[str, Extractor] = {}
+EXTRACTORS_BY_MIME_TYPE: Dict[str, Extractor] = {}
+
+
+def register_extractor(extensions: Iterable[str], mime_types: Iterable[str] = ()):
+    """Register a generator function as the extractor for extensions and MIME types"""
+    def decorator(extractor: Extractor) -> Extractor:
+        for extension in extensions:
+            EXTRACTORS_BY_EXTENSION[extension.lower()] = extractor
+        for mime_type in mime_types:
+            EXTRACTORS_BY_MIME_TYPE[mime_type.lower()] = extractor
+        return extractor
+    return decorator
+
+
+def get_extractor(extension: Optional[str] = None, mime_type: Optional[str] = None) -> Extractor:
+    """Find the extractor for a file, falling back to plain text"""
+    if extension and extension.lower() in EXTRACTORS_BY_EXTENSION:
+        return EXTRACTORS_BY_EXTENSION[extension.lower()]
+    if mime_type:
+        mime_type = mime_type.split(";")[0].strip().lower()
+        if mime_type in EXTRACTORS_BY_MIME_TYPE:
+            return EXTRACTORS_BY_MIME_TYPE[mime_type]
+    return extract_text
+
+
+def decode(content) -> str:
+    return content.decode("utf-8", errors="replace") if isinstance(content, (bytes, bytearray)) else content
+
+
+@register_extractor([".txt"], ["text/plain"])
+def extract_text(content: bytes) -> Iterator[Section]:
+    """Plain text: one section per blank-line separated paragraph"""
+    paragraph = []
+    for line in io.StringIO(decode(content)):
+        if line.strip():
+            paragraph.append(line.rstrip())
+        elif paragraph:
+            yield Section("paragraph", "\n".join(paragraph), "")
+            paragraph = []
+    if paragraph:
+        yield Section("paragraph", "\n".join(paragraph), "")
+
+
+@register_extractor([".pdf"], ["application/pdf"])
+def extract_pdf(content: bytes) -> Iterator[Section]:
+    """PDF: one section per page"""
+    pdf_reader = PyPDF2.PdfReader(io.BytesIO(content))
+    for page in pdf_reader.pages:
+        text = (page.extract_text() or "").strip()
+        if text:
+            yield Section("page", text, "")
+
+
+MARKDOWN_HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+MARKDOWN_LIST_ITEM = re.compile(r"^\s*(?:[-*+]|\d+[.)])\s+(.*)$")
+MARKDOWN_TABLE_SEPARATOR = re.compile(r"^\s*\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?\s*$")
+
+
+@register_extractor([".md", ".markdown"], ["text/markdown", "text/x-markdown"])
+def extract_markdown(content: bytes) -> Iterator[Section]:
+    """Markdown: headings, list items, table rows, code blocks and paragraphs"""
+    heading = ""
+    paragraph = []
+    code = None
+
+    def flush_paragraph():
+        text = " ".join(paragraph).strip()
+        paragraph.clear()
+        return Section("paragraph", text, heading) if text else None
+
+    for line in io.StringIO(decode(content)):
+        line = line.rstrip("\n")
+        if code is not None:
+            if line.strip().startswith("```"):
+                yield Section("code", "\n".join(code), heading)
+                code = None
+            else:
+                code.append(line)
+            continue
+
+        stripped = line.strip()
+        match_heading = MARKDOWN_HEADING.match(stripped)
+        match_item = MARKDOWN_LIST_ITEM.match(line)
+        is_table_row = stripped.startswith("|") and stripped.endswith("|")
+        if match_heading or match_item or is_table_row or stripped.startswith("```") or not stripped:
+            section = flush_paragraph()
+            if section:
+                yield section
+
+        if stripped.startswith("```"):
+            code = []
+        elif match_heading:
+            heading = match_heading.group(2)
+            yield Section("heading", heading, heading)
+        elif match_item:
+            yield Section("list_item", match_item.group(1).strip(), heading)
+        elif is_table_row:
+            if not MARKDOWN_TABLE_SEPARATOR.match(stripped):
+                cells = [cell.strip() for cell in stripped.strip("|").split("|")]
+                yield Section("table_row", " | ".join(cells), heading)
+        elif stripped:
+            paragraph.append(stripped)
+
+    if code:
+        yield Section("code", "\n".join(code), heading)
+    section = flush_paragraph()
+    if section:
+        yield section
+
+
+class _HTMLSectionParser(HTMLParser):
+    """Collects sections from HTML as it is fed, skipping scripts and styles.
+
+    The outermost open block decides the kind of a section: blocks nested in
+    it (<li><p>, <td><p>) only add to its text. Reopening an open block tag
+    closes it first, as with unclosed <li> and <p> siblings. As in HTML, any
+    block level tag ends an open paragraph and the end of a list or table
+    ends its open item or row.
+    """
+    BLOCKS = {"p": "paragraph", "li": "list_item", "tr": "table_row", "pre": "code",
+              "h1": "heading", "h2": "heading", "h3": "heading",
+              "h4": "heading", "h5": "heading", "h6": "heading"}
+    BREAKS = {"div", "br", "section", "article", "blockquote", "dd", "dt", "ul", "ol", "table"}
+    SKIPPED = {"script", "style", "noscript", "head", "template"}
+    ITEMS = {"ul": "li", "ol": "li", "table": "tr"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.sections = []
+        self.heading = ""
+        self._kind = "paragraph"
+        self._open = []  # Open block tags, outermost first
+        self._text = []
+        self._cells = []
+        self._skip_depth = 0
+
+    def _flush(self):
+        text = " ".join("".join(self._text).split())
+        self._text = []
+        if self._kind == "table_row":
+            if text:
+                self._cells.append(text)
+            text = " | ".join(self._cells)
+            self._cells = []
+        if not text:
+            return
+        if self._kind == "heading":
+            self.heading = text
+        self.sections.append(Section(self._kind, text, self.heading))
+
+    def _close(self, tag):
+        """Close an open block and any blocks nested in it"""
+        while self._open.pop() != tag:
+            pass
+        if self._open:
+            self._text.append(" ")
+        else:
+            self._flush()
+            self._kind = "paragraph"
+
+    def handle_starttag(self, tag, attrs):
+        if "p" in self._open and (tag in self.BLOCKS or tag in self.BREAKS and tag != "br"):
+            self._close("p")
+        if tag in self.SKIPPED:
+            self._skip_depth += 1
+        elif tag in self.BLOCKS:
+            if tag in self._open:
+                self._close(tag)
+            if self._open:
+                self._text.append(" ")
+            else:
+                self._flush()
+                self._kind = self.BLOCKS[tag]
+            self._open.append(tag)
+        elif tag in ("td", "th") and self._kind == "table_row":
+            cell = " ".join("".join(self._text).split())
+            self._text = []
+            if cell:
+                self._cells.append(cell)
+        elif tag in self.BREAKS:
+            if self._open:
+                self._text.append(" ")
+            else:
+                self._flush()
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIPPED:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in self.BLOCKS:
+            if tag in self._open:
+                self._close(tag)
+        elif tag in self.BREAKS:
+            if self.ITEMS.get(tag) in self._open:
+                self._close(self.ITEMS[tag])
+            elif self._open:
+                self._text.append(" ")
+            else:
+                self._flush()
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self._text.append(data)
+
+
+@register_extractor([".html", ".htm"], ["text/html", "application/xhtml+xml"])
+def extract_html(content: bytes, block_size: int = 64 * 1024) -> Iterator[Section]:
+    """HTML: headings, list items, table rows and paragraphs, parsed block by block"""
+    text = decode(content)
+    parser = _HTMLSectionParser()
+    for start in range(0, len(text), block_size):
+        parser.feed(text[start:start + block_size])
+        yield from parser.sections
+        parser.sections = []
+    parser.close()
+    parser._flush()
+    yield from parser.sections
+
+
+@register_extractor(
+    [".docx"],
+    ["application/vnd.openxmlformats-officedocument.wordprocessingml.document"]
+)
+def extract_docx(content: bytes) -> Iterator[Section]:
+    """DOCX: paragraphs, headings, list items and table rows in document order"""
+    from docx import Document
+    from docx.table import Table
+    from docx.text.paragraph import Paragraph
+
+    document = Document(io.BytesIO(content))
+    # Resolve style names once: python-docx looks styles up by scanning them
+    style_names = {style.style_id: style.name for style in document.styles}
+    heading = ""
+    for element in document.element.body.iterchildren():
+        tag = element.tag.rsplit("}", 1)[-1]
+        if tag == "p":
+            paragraph = Paragraph(element, document)
+            text = paragraph.text.strip()
+            if not text:
+                continue
+            style = style_names.get(element.style, "") or ""
+            if style.startswith("Heading") or style == "Title":
+                heading = text
+                yield Section("heading", text, heading)
+            elif "List" in style or element.pPr is not None and element.pPr.numPr is not None:
+                yield Section("list_item", text, heading)
+            else:
+                yield Section("paragraph", text, heading)
+        elif tag == "tbl":
+            for row in Table(element, document).rows:
+                cells = []
+                for cell in row.cells:
+                    text = " ".join(cell.text.split())
+                    # Merged cells repeat across the row, keep them once
+                    if text and (not cells or cells[-1] != text):
+                        cells.append(text)
+                if cells:
+                    yield Section("table_row", " | ".join(cells), heading)
+
+
+def chunk_sections(sections: Iterable[Section], splitter_for: Callable[[int], object], chunk_size: int,
+                   length_function: Callable[[str], int] = len) -> Iterator[str]:
+    """Group consecutive sections under the same heading into chunks.
+
+    Chunks never span two headings and start with their heading so they keep
+    their context. Sizes are measured with length_function (characters by
+    default) and include the heading: groups larger than chunk_size are split
+    with splitter_for(budget), a splitter for the room left after the heading.
+    Headings taking more than half of chunk_size are not repeated.
+    Chunks are yielded as soon as they are complete.
+    """
+    buffer = []
+    heading = ""
+    prefix, prefix_length = "", 0
+    length = 0
+
+    def flush():
+        body = "\n".join(buffer)
+        if length_function(prefix + body) <= chunk_size:
+            return [prefix + body]
+        return [prefix + piece for piece in splitter_for(chunk_size - prefix_length).split_text(body)]
+
+    for section in sections:
+        if section.kind == "heading" or section.heading != heading:
+            if buffer:
+                yield from flush()
+            heading = section.heading
+            prefix = f"{heading}\n" if heading else ""
+            prefix_length = length_function(prefix) if prefix else 0
+            if prefix_length > chunk_size // 2:
+                prefix, prefix_length = "", 0
+            buffer, length = [], prefix_length
+            if section.kind == "heading":
+                continue
+        section_length = length_function(section.text) + 1
+        if buffer and length + section_length > chunk_size:
+            yield from flush()
+            buffer, length = [], prefix_length
+        buffer.append(section.text)
+        length += section_length
+    if buffer:
+        yield from flush()
@@ -1,25 +1,45 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Header
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 import chromadb
 from chromadb.config import Settings
 import os
 from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import Chroma
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_openai import ChatOpenAI
-from langchain.chains import RetrievalQA
 import uvicorn
 import logging
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, FileResponse
+from starlette.background import BackgroundTask
 import asyncio
-import PyPDF2
-import io
 from langchain.prompts import PromptTemplate
-from functools import lru_cache
 import hashlib
+import hmac
+import itertools
+import json
+import time
+import uuid
+import random
+import tempfile
+import threading
+from collections import OrderedDict
 from dotenv import load_dotenv
+from compact_index import CompactVectorIndex, QUANTIZATION_MODES
+from embedding_cache import EmbeddingCache, tokenizer_lowercases
+from chunking import CHUNKING_STRATEGIES, DEFAULT_CHUNK_PARAMETERS, chunk_document
+from extractors import get_extractor
+from sessions import (
+    format_history,
+    get_session,
+    is_casual,
+    is_follow_up,
+    rank_chunks,
+    remember_question,
+    retrieve_for_session,
+    rewrite_follow_up,
+)
+from migration import EmbeddingMigration
+from snapshot import SnapshotError, export_snapshot, import_snapshot, read_collection
 
 # Load environment variables
 load_dotenv()
@@ -41,21 +61,122 @@ app.add_middleware(
 
 # Constants
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
-CHUNK_SIZE = 1000  # Increased for better context
-CHUNK_OVERLAP = 200  # Increased for better continuity
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")  # Until a migration switches to another model
+COLLECTION_NAMES = ("training_data", "hr_it_docs")
+# Chunking strategy for uploads: "character", "token" or "sentence" (see chunking.py).
+# Sizes are in tokens of the embedding model's tokenizer for the token strategy (the default
+# of 254 fits all-MiniLM-L6-v2); use sweep_chunking.py to compare settings.
+CHUNKING_STRATEGY = os.getenv("CHUNKING_STRATEGY", "character")
+if CHUNKING_STRATEGY not in CHUNKING_STRATEGIES:
+    raise ValueError(f"CHUNKING_STRATEGY must be one of {CHUNKING_STRATEGIES}, got {CHUNKING_STRATEGY}")
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", DEFAULT_CHUNK_PARAMETERS[CHUNKING_STRATEGY][0]))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", DEFAULT_CHUNK_PARAMETERS[CHUNKING_STRATEGY][1]))
+INGEST_BATCH_SIZE = 64  # Chunks embedded and added per batch during upload
 CACHE_TTL = 3600  # Cache time-to-live in seconds
+RETRIEVAL_K = 4  # Chunks passed to the LLM per collection
+
+# Embedding model migration configuration
+CLEAR_COLLECTIONS_ON_STARTUP = os.getenv("CLEAR_COLLECTIONS_ON_STARTUP", "true").lower() == "true"
+MIGRATION_RATE_LIMIT = 50.0  # Chunks re-embedded per second by a migration
+# Seconds a built shadow index is verified against live queries before switching
+MIGRATION_VERIFY_SECONDS = float(os.getenv("MIGRATION_VERIFY_SECONDS", "600"))
+# Optional minimum mean overlap per collection with the live results before switching
+MIGRATION_MIN_OVERLAP = float(os.getenv("MIGRATION_MIN_OVERLAP")) if os.getenv("MIGRATION_MIN_OVERLAP") else None
+SHADOW_SAMPLE_RATE = 0.2  # Fraction of live queries repeated on the shadow index
+OLD_INDEX_GRACE_SECONDS = 60  # Delay before the replaced index is deleted
+# Records the model of the live index once a migration has switched, so it survives restarts
+ACTIVE_MODEL_PATH = os.getenv("ACTIVE_MODEL_PATH", "./active_model.json")
 
-# Cache configuration
-@lru_cache(maxsize=100)
-def get_document_embedding(text: str):
-    return embeddings.embed_query(text)
+# Conversation session configuration
+SESSION_CACHE_K = 12  # Chunks cached per collection so follow-ups can be re-ranked locally
 
-@lru_cache(maxsize=1000)
-def get_question_embedding(text: str):
-    return embeddings.embed_query(text)
+# Query embedding cache configuration, the SQLite tier is shared by all workers
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "./embedding_cache.sqlite3")
+EMBEDDING_CACHE_MEMORY_SIZE = 1000  # Entries kept in each process
+EMBEDDING_CACHE_DISK_SIZE = 100000  # Entries kept on disk (~1.6KB each)
+
+# Optional compact vector mode ("float16" or "int8"): queries are served from
+# quantized in-memory codes with exact re-scoring instead of Chroma's HNSW index.
+# Chroma still stores every vector and its HNSW graph, so this adds to the footprint.
+COMPACT_VECTORS = os.getenv("COMPACT_VECTORS") or None
+COMPACT_RESCORE_FACTOR = 4  # Candidates re-scored exactly per requested result
+if COMPACT_VECTORS and COMPACT_VECTORS not in QUANTIZATION_MODES:
+    raise ValueError(f"COMPACT_VECTORS must be one of {QUANTIZATION_MODES}, got {COMPACT_VECTORS}")
 
 # Initialize ChromaDB with optimized settings
 CHROMA_DB_PATH = "./chroma_db"
+
+# HNSW index parameters per collection. Embeddings are normalized, so the
+# distance is set to cosine explicitly instead of Chroma's l2 default.
+# search_ef must stay >= the largest n_results we query (SESSION_CACHE_K).
+# Any value can be overridden with HNSW_<COLLECTION>_<PARAM>, for example
+# HNSW_HR_IT_DOCS_SEARCH_EF=128. Use benchmark_hnsw.py to pick operating points.
+HNSW_DEFAULTS = {"space": "cosine", "M": 16, "construction_ef": 100, "search_ef": 32}
+HNSW_CONFIG = {
+    "training_data": {},  # Small, static Q&A set: defaults are plenty
+    "hr_it_docs": {"M": 32, "construction_ef": 200, "search_ef": 64},
+}
+
+def hnsw_metadata(collection_name: str) -> dict:
+    """Build the Chroma collection metadata holding the HNSW parameters"""
+    config = {**HNSW_DEFAULTS, **HNSW_CONFIG.get(collection_name, {})}
+    metadata = {}
+    for param, value in config.items():
+        env_value = os.getenv(f"HNSW_{collection_name.upper()}_{param.upper()}")
+        if env_value is not None:
+            value = env_value if param == "space" else int(env_value)
+        metadata[f"hnsw:{param}"] = value
+    return metadata
+
+def collection_metadata(collection_name: str, **chunking) -> dict:
+    """Collection metadata: HNSW parameters plus how the contents were embedded and chunked.
+
+    Snapshots read the embedding model and chunking parameters from here, and
+    index_name maps a migrated collection back to its logical name on startup.
+    """
+    return {
+        **hnsw_metadata(collection_name),
+        "embedding_model": active_index["model"],
+        "index_name": collection_name,
+        **chunking
+    }
+
+def physical_name(collection_name: str, state=None) -> str:
+    """ChromaDB name backing a logical collection in the given (default: live) index"""
+    return (state or active_index)["collections"][collection_name]
+
+def get_compact_index(collection_name: str, dimension: int, state=None) -> CompactVectorIndex:
+    """Return the compact index for a collection, creating it on first use.
+
+    Every worker builds its own index, so the memory-mapped float32 file is a
+    private temporary file rather than a path shared by all processes.
+    """
+    state = state or active_index
+    if collection_name not in state["compact"]:
+        state["compact"][collection_name] = CompactVectorIndex(
+            dimension,
+            mode=COMPACT_VECTORS,
+            rescore_factor=COMPACT_RESCORE_FACTOR
+        )
+    return state["compact"][collection_name]
+
+def drop_compact_index(collection_name: str, state=None):
+    """Remove a collection's compact index and its memory-mapped file"""
+    index = (state or active_index)["compact"].pop(collection_name, None)
+    if index is not None:
+        index.close(remove=True)
+
+def rebuild_compact_index(collection_name: str, state=None):
+    """Rebuild a collection's compact index from the vectors stored in ChromaDB"""
+    state = state or active_index
+    drop_compact_index(collection_name, state)
+    name = physical_name(collection_name, state)
+    if not any(col.name == name for col in chroma_client.list_collections()):
+        return
+    ids, _, _, vectors = read_collection(chroma_client.get_collection(name))
+    if ids:
+        get_compact_index(collection_name, vectors.shape[1], state).add(ids, vectors)
+
 try:
     chroma_client = chromadb.PersistentClient(
         path=CHROMA_DB_PATH,
@@ -67,28 +188,94 @@ try:
     )
     
     # Clear existing collections on startup
-    existing_collections = chroma_client.list_collections()
-    for collection in existing_collections:
-        chroma_client.delete_collection(collection.name)
-        logger.info(f"Deleted existing collection: {collection.name}")
-    
-    logger.info("ChromaDB initialized successfully and collections cleared")
+    if CLEAR_COLLECTIONS_ON_STARTUP:
+        existing_collections = chroma_client.list_collections()
+        for collection in existing_collections:
+            chroma_client.delete_collection(collection.name)
+            logger.info(f"Deleted existing collection: {collection.name}")
+        # The index is rebuilt with EMBEDDING_MODEL, a migrated model no longer applies
+        if os.path.exists(ACTIVE_MODEL_PATH):
+            os.remove(ACTIVE_MODEL_PATH)
+        logger.info("ChromaDB initialized successfully and collections cleared")
+    else:
+        logger.info("ChromaDB initialized successfully, keeping existing collections")
 except Exception as e:
     logger.error(f"Error initializing ChromaDB: {str(e)}")
     raise
 
-# Initialize embeddings with optimized model
-try:
-    embeddings = HuggingFaceEmbeddings(
-        model_name="all-MiniLM-L6-v2",
+def make_embeddings(model_name: str):
+    """Load a sentence-transformers model with the settings used for every index"""
+    return HuggingFaceEmbeddings(
+        model_name=model_name,
         model_kwargs={'device': 'cpu'},
         encode_kwargs={'normalize_embeddings': True}
     )
+
+def make_index_state(model_name: str, model_embeddings, collections: dict, compact=None) -> dict:
+    """Everything a request needs to query one index, swapped as a single object on migration"""
+    return {
+        "model": model_name,
+        "embeddings": model_embeddings,
+        "query_cache": EmbeddingCache(
+            model_embeddings.embed_query,
+            model_name,
+            EMBEDDING_CACHE_PATH,
+            memory_size=EMBEDDING_CACHE_MEMORY_SIZE,
+            disk_size=EMBEDDING_CACHE_DISK_SIZE,
+            # Only uncased models may share cache entries between differently cased questions
+            lowercase=tokenizer_lowercases(getattr(getattr(model_embeddings, "client", None), "tokenizer", None))
+        ),
+        "collections": collections,
+        "compact": compact if compact is not None else {},
+    }
+
+def read_active_model() -> Optional[str]:
+    """Model the live index was switched to by a migration, if any"""
+    try:
+        with open(ACTIVE_MODEL_PATH) as file:
+            return json.load(file)["model"]
+    except FileNotFoundError:
+        return None
+
+def write_active_model(model_name: str):
+    """Record the live model, replacing the file atomically"""
+    tmp_path = f"{ACTIVE_MODEL_PATH}.tmp"
+    with open(tmp_path, "w") as file:
+        json.dump({"model": model_name, "switched_at": time.time()}, file)
+    os.replace(tmp_path, ACTIVE_MODEL_PATH)
+
+def resolve_collection_names(model_name: str) -> dict:
+    """Map logical collection names to the kept collections embedded with model_name"""
+    collections = {name: name for name in COLLECTION_NAMES}
+    for collection in chroma_client.list_collections():
+        metadata = collection.metadata or {}
+        if metadata.get("index_name") in collections and metadata.get("embedding_model") == model_name:
+            collections[metadata["index_name"]] = collection.name
+    return collections
+
+# Initialize embeddings with optimized model
+try:
+    # A migration's switch outlives EMBEDDING_MODEL until the collections are cleared
+    live_model = read_active_model() or EMBEDDING_MODEL
+    if live_model != EMBEDDING_MODEL:
+        logger.info(f"Using embedding model {live_model} from {ACTIVE_MODEL_PATH} instead of {EMBEDDING_MODEL}")
+    embeddings = make_embeddings(live_model)
+    # The live index; replaced wholesale when a migration switches over
+    active_index = make_index_state(live_model, embeddings, resolve_collection_names(live_model))
+    # Held while writing to the live index so a migration can switch between writes
+    index_lock = threading.Lock()
+    migration = None
+    active_requests = 0
     logger.info("Embeddings model loaded successfully")
 except Exception as e:
     logger.error(f"Error loading embeddings model: {str(e)}")
     raise
 
+# Compact indexes live in memory, so collections kept from a previous run need them rebuilt
+if COMPACT_VECTORS and not CLEAR_COLLECTIONS_ON_STARTUP:
+    for name in COLLECTION_NAMES:
+        rebuild_compact_index(name)
+
 # Initialize LLM
 try:
     llm = ChatOpenAI(
@@ -104,52 +291,119 @@ except Exception as e:
 
 class Question(BaseModel):
     text: str
+    session_id: Optional[str] = None
 
-def extract_text_from_pdf(pdf_bytes):
-    """Extract text from PDF bytes"""
-    try:
-        pdf_file = io.BytesIO(pdf_bytes)
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        text = ""
-        for page_num in range(len(pdf_reader.pages)):
-            page = pdf_reader.pages[page_num]
-            text += page.extract_text() + "\n"
-        return text
-    except Exception as e:
-        logger.error(f"Error extracting text from PDF: {str(e)}")
-        raise
+class MigrationRequest(BaseModel):
+    model: str
+    rate_limit: Optional[float] = None
+    verify_seconds: Optional[float] = None  # Default MIGRATION_VERIFY_SECONDS
+    min_overlap: Optional[float] = None  # Default MIGRATION_MIN_OVERLAP
+    require_confirmation: bool = False  # Switch only on POST /admin/migration/confirm
 
-async def process_file_content(content, file_extension=None):
+# Keeps fire-and-forget tasks (shadow queries) referenced until they finish
+background_tasks = set()
+
+# In-memory conversation sessions, most recently used last
+sessions = OrderedDict()
+# Bumped whenever the document collections change so cached chunks are not reused
+corpus_version = 0
+
+def add_to_collection(collection_name: str, documents: List[str], ids: List[str]):
+    """Embed documents and add them to a live collection (and its compact index)"""
+    with index_lock:
+        state = active_index
+        collection = chroma_client.get_collection(physical_name(collection_name, state))
+        document_embeddings = state["embeddings"].embed_documents(documents)
+        collection.add(
+            documents=documents,
+            embeddings=document_embeddings,
+            ids=ids
+        )
+        if COMPACT_VECTORS and document_embeddings:
+            index = get_compact_index(collection_name, len(document_embeddings[0]), state)
+            index.add(ids, document_embeddings)
+
+def query_collection(collection_name: str, query_embedding, n_results: int, state=None):
+    """Query a collection by embedding, returning (document, embedding) pairs"""
+    state = state or active_index
+    collections = chroma_client.list_collections()
+    if not any(col.name == physical_name(collection_name, state) for col in collections):
+        return []
+    collection = chroma_client.get_collection(physical_name(collection_name, state))
+    if COMPACT_VECTORS:
+        index = state["compact"].get(collection_name)
+        if index is None or len(index) == 0:
+            return []
+        hits = index.search(query_embedding, n_results)
+        ids = [id_ for id_, _ in hits]
+        stored = collection.get(ids=ids, include=["documents"])
+        documents = dict(zip(stored["ids"], stored["documents"]))
+        return [
+            (documents[id_], vector)
+            for id_, vector in zip(ids, index.get_vectors(ids))
+            if id_ in documents
+        ]
+    count = collection.count()
+    if count == 0:
+        return []
+    results = collection.query(
+        query_embeddings=[query_embedding],
+        n_results=min(n_results, count),
+        include=["documents", "embeddings"]
+    )
+    return list(zip(results["documents"][0], results["embeddings"][0]))
+
+def next_batch(chunks, size: int) -> List[str]:
+    """Pull the next batch of chunks, running extraction and chunking as far as needed"""
+    return list(itertools.islice(chunks, size))
+
+async def process_file_content(content, file_extension=None, mime_type=None):
     """Process file content asynchronously"""
     try:
-        # If it's a PDF, extract text first
-        if file_extension and file_extension.lower() == '.pdf':
-            content = extract_text_from_pdf(content.encode('utf-8') if isinstance(content, str) else content)
-            logger.info("Extracted text from PDF")
+        # Extract structure-aware sections with the extractor for this file type
+        extractor = get_extractor(file_extension, mime_type)
+        logger.info(f"Extracting with {extractor.__name__}")
         
-        # Split text into chunks
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=CHUNK_SIZE,
-            chunk_overlap=CHUNK_OVERLAP
+        # Split sections into chunks as they are extracted. Parsing and chunking
+        # happen on a worker thread, one batch at a time, to keep the event loop free.
+        # The token strategy counts tokens with the live embedding model's tokenizer
+        chunks = await asyncio.to_thread(
+            chunk_document, extractor(content), CHUNKING_STRATEGY, CHUNK_SIZE, CHUNK_OVERLAP, active_index["model"]
         )
-        chunks = text_splitter.split_text(content)
-        logger.info(f"Split document into {len(chunks)} chunks")
         
         # Create or get collection
         collection_name = "hr_it_docs"
         try:
-            collection = chroma_client.get_collection(collection_name)
+            chroma_client.get_collection(physical_name(collection_name))
             logger.info("Retrieved existing collection")
         except:
-            collection = chroma_client.create_collection(collection_name)
+            chroma_client.create_collection(
+                physical_name(collection_name),
+                metadata=collection_metadata(
+                    collection_name,
+                    chunking=CHUNKING_STRATEGY,
+                    chunk_size=CHUNK_SIZE,
+                    chunk_overlap=CHUNK_OVERLAP
+                )
+            )
             logger.info("Created new collection")
         
-        # Add documents to collection
-        collection.add(
-            documents=chunks,
-            ids=[f"doc_{i}" for i in range(len(chunks))]
-        )
-        logger.info("Documents added to collection successfully")
+        # Ids are unique per upload: Chroma silently ignores ids it already has
+        upload_id = uuid.uuid4().hex
+        
+        # Add documents to collection in batches while chunks stream in
+        chunk_count = 0
+        while batch := await asyncio.to_thread(next_batch, chunks, INGEST_BATCH_SIZE):
+            await asyncio.to_thread(
+                add_to_collection, collection_name, batch,
+                [f"doc_{upload_id}_{chunk_count + i}" for i in range(len(batch))]
+            )
+            chunk_count += len(batch)
+        logger.info(f"Added {chunk_count} chunks to collection successfully")
+        
+        # Invalidate context cached by conversation sessions
+        global corpus_version
+        corpus_version += 1
         
         return True
     except Exception as e:
@@ -173,7 +427,7 @@ async def upload_document(file: UploadFile = File(...)):
         
         # Process the file content
         file_extension = os.path.splitext(file.filename)[1].lower()
-        await process_file_content(bytes(content), file_extension)
+        await process_file_content(bytes(content), file_extension, file.content_type)
         
         return {"message": "File processed successfully"}
     except Exception as e:
@@ -213,11 +467,11 @@ def load_training_data():
         try:
             # Check if collection exists
             collections = chroma_client.list_collections()
-            collection_exists = any(col.name == collection_name for col in collections)
+            collection_exists = any(col.name == physical_name(collection_name) for col in collections)
             
             if collection_exists:
                 # Collection exists, get existing IDs to avoid duplicates
-                collection = chroma_client.get_collection(collection_name)
+                collection = chroma_client.get_collection(physical_name(collection_name))
                 logger.info("Retrieved existing training collection")
                 
                 # Don't re-add training data if it already exists
@@ -226,7 +480,10 @@ def load_training_data():
                     return True
             else:
                 # Create new collection
-                collection = chroma_client.create_collection(collection_name)
+                collection = chroma_client.create_collection(
+                    physical_name(collection_name),
+                    metadata=collection_metadata(collection_name, chunking="qa_pairs")
+                )
                 logger.info("Created new training collection")
                 
             # Add Q&A pairs to collection
@@ -242,10 +499,7 @@ def load_training_data():
                     documents.append(combined_text)
                     ids.append(f"training_{i+j}")
                 
-                collection.add(
-                    documents=documents,
-                    ids=ids
-                )
+                add_to_collection(collection_name, documents, ids)
                 logger.info(f"Added batch of {len(batch)} training Q&A pairs to collection")
             
             logger.info(f"Added {len(qa_pairs)} total training Q&A pairs to collection")
@@ -264,97 +518,134 @@ def load_training_data():
 async def health_check():
     return {"status": "ok"}
 
+def load_snapshot(path: str):
+    """Bulk-load a snapshot file into ChromaDB without re-embedding.
+
+    Holds index_lock so uploads and migration switches wait while the live
+    collections are replaced.
+    """
+    with index_lock:
+        if migration is not None and migration.running:
+            raise SnapshotError("Cannot import a snapshot while an embedding migration is running")
+        manifest = import_snapshot(
+            chroma_client,
+            path,
+            active_index["model"],
+            {name: physical_name(name) for name in COLLECTION_NAMES}
+        )
+        for name in manifest["collections"]:
+            if COMPACT_VECTORS and name in COLLECTION_NAMES:
+                rebuild_compact_index(name)
+    
+    # Invalidate context cached by conversation sessions
+    global corpus_version
+    corpus_version += 1
+    
+    counts = {name: info["count"] for name, info in manifest["collections"].items()}
+    logger.info(f"Loaded snapshot {path}: {counts}")
+    return counts
+
+# Provision from a snapshot if one is configured, then load any missing training data
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH")
+if SNAPSHOT_PATH:
+    load_snapshot(SNAPSHOT_PATH)
+
 # Load training data on startup
 load_training_data()
 
 @app.post("/ask")
 async def ask_question(question: Question):
+    global active_requests
+    active_requests += 1
     try:
         logger.info(f"Received question: {question.text}")
+        start_time = time.time()
+        # Use one index for the whole request, even if a migration switches over meanwhile
+        state = active_index
+        
+        session = get_session(sessions, question.session_id, corpus_version, CACHE_TTL)
+        casual = is_casual(question.text)
+        follow_up = is_follow_up(question.text, session)
+        standalone_question = rewrite_follow_up(question.text, session)
+        if standalone_question != question.text:
+            logger.info(f"Rewrote follow-up as: {standalone_question}")
         
         # Initialize variables
-        docs_context = ""
-        training_context = ""
-        retriever = None
+        docs_results = []
+        training_results = []
         
-        # Get training data context with improved retrieval
+        # Get training data and uploaded documents context, reusing the
+        # session's cached chunks when the question stays on the same topic
         try:
             collections = chroma_client.list_collections()
-            if not any(col.name == "training_data" for col in collections):
+            if not any(col.name == physical_name("training_data", state) for col in collections):
                 logger.error("Training data collection not found")
                 raise HTTPException(
                     status_code=500, 
                     detail="Training data not initialized properly. Please restart the server."
                 )
-                
-            training_collection = chroma_client.get_collection("training_data")
-            training_vectorstore = Chroma(
-                client=chroma_client,
-                collection_name="training_data",
-                embedding_function=embeddings
-            )
-            training_retriever = training_vectorstore.as_retriever(
-                search_type="similarity",
-                search_kwargs={
-                    "k": 4
+            
+            query_embedding = await asyncio.to_thread(state["query_cache"].embed, standalone_question)
+            # The topic check uses the question as asked, the rewrite always contains the old topic
+            question_embedding = query_embedding
+            if standalone_question != question.text:
+                question_embedding = await asyncio.to_thread(state["query_cache"].embed, question.text)
+            
+            def fetch(embedding):
+                return {
+                    name: query_collection(name, embedding, SESSION_CACHE_K, state)
+                    for name in COLLECTION_NAMES
                 }
+            
+            # Timed without embedding, the shadow side is measured the same way
+            retrieval_start = time.perf_counter()
+            chunks, reused = await asyncio.to_thread(
+                retrieve_for_session, session, query_embedding, question_embedding, corpus_version, fetch
             )
-            training_results = training_retriever.get_relevant_documents(question.text)
-            training_context = "\n\n".join([doc.page_content for doc in training_results])
-            logger.info("Retrieved training data successfully")
+            retrieval_ms = (time.perf_counter() - retrieval_start) * 1000
+            training_results = rank_chunks(chunks["training_data"], query_embedding, RETRIEVAL_K)
+            docs_results = rank_chunks(chunks["hr_it_docs"], query_embedding, RETRIEVAL_K)
+            logger.info(f"Retrieved context (cached: {reused})")
             
-            # Set the default retriever to training data
-            retriever = training_retriever
+            # Repeat a sample of fresh retrievals on the shadow index of a verifying
+            # migration, comparing everything fetched (SESSION_CACHE_K per collection)
+            if (
+                migration is not None
+                and migration.state == "verifying"
+                and not reused
+                and random.random() < SHADOW_SAMPLE_RATE
+            ):
+                shadow_task = asyncio.create_task(asyncio.to_thread(
+                    migration.shadow_query,
+                    standalone_question,
+                    {name: [document for document, _ in chunks[name]] for name in COLLECTION_NAMES},
+                    retrieval_ms
+                ))
+                background_tasks.add(shadow_task)
+                shadow_task.add_done_callback(background_tasks.discard)
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error accessing training data: {str(e)}")
             logger.exception("Detailed stack trace for training data error:")
             raise HTTPException(status_code=500, detail=f"Error accessing training data: {str(e)}")
         
-        # Get uploaded documents context with improved retrieval
-        try:
-            collections = chroma_client.list_collections()
-            if any(col.name == "hr_it_docs" for col in collections):
-                docs_collection = chroma_client.get_collection("hr_it_docs")
-                docs_vectorstore = Chroma(
-                    client=chroma_client,
-                    collection_name="hr_it_docs",
-                    embedding_function=embeddings
-                )
-                docs_retriever = docs_vectorstore.as_retriever(
-                    search_type="similarity",
-                    search_kwargs={
-                        "k": 4
-                    }
-                )
-                docs_results = docs_retriever.get_relevant_documents(question.text)
-                docs_context = "\n\n".join([doc.page_content for doc in docs_results])
-                logger.info("Found and used uploaded documents")
-                # Update the retriever to use uploaded documents for non-casual questions
-                if not any(casual_phrase in question.text.lower() for casual_phrase in ["hi", "hello", "thanks", "thank", "okay", "bye", "good morning", "good afternoon"]):
-                    retriever = docs_retriever
-                    logger.info("Using uploaded documents as primary retriever")
-            else:
-                logger.info("No uploaded documents collection found")
-        except Exception as e:
-            logger.error(f"Error accessing uploaded documents: {str(e)}")
-            logger.exception("Detailed stack trace for documents error:")
-            # Don't raise exception here, just log and continue
-        
-        # Combine contexts
-        combined_context = ""
-        
-        # First check if it's a casual conversation by looking at training context
-        if any(casual_phrase in question.text.lower() for casual_phrase in ["hi", "hello", "thanks", "thank", "okay", "bye", "good morning", "good afternoon"]):
-            # Prioritize training context for casual conversations
-            combined_context = training_context
+        # For regular questions, prioritize uploaded documents context;
+        # casual conversation is answered from the training data
+        if docs_results and not casual:
+            source_documents = docs_results
+            logger.info("Using uploaded documents as primary context")
         else:
-            # For regular questions, prioritize uploaded documents context
-            combined_context = f"{docs_context}\n\n{training_context}".strip() if docs_context else training_context
-            
+            source_documents = training_results
+        
+        combined_context = "\n\n".join(source_documents)
         if not combined_context:
             logger.warning("No context retrieved for question")
             combined_context = "No specific information available for this message."
         
+        history = format_history(session)
+        history_section = f"Conversation so far:\n{history}\n\n" if history else ""
+        
         # Create a more focused prompt template
         prompt_template = """You are a friendly and helpful HR/IT assistant. Use the following context to answer the user's question professionally and naturally. Maintain conversation flow without unnecessary greetings.
 
@@ -366,50 +657,43 @@ Important guidelines:
 5. Only include a greeting if the user is starting a new conversation or explicitly greeting you
 6. Focus on providing direct, relevant answers while maintaining a professional tone
 
-Context: {context}
+{history}Context: {context}
 
 Question: {question}
 
 Answer: """
-
-        # Initialize QA chain with optimized settings
-        try:
-            qa_chain = RetrievalQA.from_chain_type(
-                llm=llm,
-                chain_type="stuff",
-                retriever=retriever,
-                return_source_documents=True,
-                chain_type_kwargs={
-                    "prompt": PromptTemplate(
-                        template=prompt_template,
-                        input_variables=["context", "question"]
-                    )
-                }
-            )
-        except Exception as e:
-            logger.error(f"Error initializing QA chain: {str(e)}")
-            logger.exception("Detailed stack trace for QA chain initialization error:")
-            raise HTTPException(status_code=500, detail=f"Error initializing QA chain: {str(e)}")
+        prompt = PromptTemplate(
+            template=prompt_template,
+            input_variables=["history", "context", "question"]
+        ).format(history=history_section, context=combined_context, question=question.text)
         
         # Get response with timeout
         try:
             response = await asyncio.wait_for(
-                asyncio.to_thread(qa_chain.invoke, {"query": question.text}),
+                asyncio.to_thread(llm.invoke, prompt),
                 timeout=45.0  # Increased timeout to 45 seconds
             )
             
             # Ensure response has the expected structure
-            if not response or "result" not in response:
+            if not response or not getattr(response, "content", None):
                 logger.error(f"Invalid response structure: {response}")
                 raise HTTPException(
                     status_code=500, 
                     detail="Invalid response from language model"
                 )
+            
+            answer = response.content
+            session["history"].append((question.text, answer))
+            remember_question(session, question.text, follow_up)
+            logger.info(f"Answered in {time.time() - start_time:.2f}s (session {session['id']})")
                 
             return JSONResponse(content={
-                "answer": response["result"],
-                "sources": [doc.page_content[:200] + "..." for doc in response.get("source_documents", [])]
+                "answer": answer,
+                "sources": [doc[:200] + "..." for doc in source_documents],
+                "session_id": session["id"]
             })
+        except HTTPException:
+            raise
         except asyncio.TimeoutError:
             logger.error("Response generation timed out")
             raise HTTPException(status_code=504, detail="Response generation timed out")
@@ -425,15 +709,23 @@ Answer: """
         logger.error(f"Error processing question: {str(e)}")
         logger.exception("Detailed stack trace for question processing error:")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+    finally:
+        active_requests -= 1
 
 @app.post("/clear")
 async def clear_collections():
     """Clear the uploaded documents collection"""
     try:
-        collections = chroma_client.list_collections()
-        if any(col.name == "hr_it_docs" for col in collections):
-            chroma_client.delete_collection("hr_it_docs")
-            logger.info("Cleared hr_it_docs collection")
+        with index_lock:
+            collections = chroma_client.list_collections()
+            if any(col.name == physical_name("hr_it_docs") for col in collections):
+                chroma_client.delete_collection(physical_name("hr_it_docs"))
+                logger.info("Cleared hr_it_docs collection")
+            drop_compact_index("hr_it_docs")
+        
+        # Invalidate context cached by conversation sessions
+        global corpus_version
+        corpus_version += 1
         
         # Ensure we return a successful response
         return {"message": "Collections cleared successfully"}
@@ -441,5 +733,163 @@ async def clear_collections():
         logger.error(f"Error clearing collections: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def check_admin_token(token: Optional[str]):
+    """Require the X-Admin-Token header; admin endpoints are disabled unless ADMIN_TOKEN is set"""
+    expected = os.getenv("ADMIN_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled: ADMIN_TOKEN is not set")
+    if not token or not hmac.compare_digest(token, expected):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@app.get("/admin/embedding-cache")
+async def embedding_cache_stats(x_admin_token: Optional[str] = Header(None)):
+    """Hit-rate metrics for the query embedding cache"""
+    check_admin_token(x_admin_token)
+    return active_index["query_cache"].get_stats()
+
+@app.get("/admin/snapshot")
+async def download_snapshot(x_admin_token: Optional[str] = Header(None)):
+    """Export all collections as a snapshot file"""
+    check_admin_token(x_admin_token)
+    fd, path = tempfile.mkstemp(suffix=".snapshot")
+    os.close(fd)
+    sent = False
+    try:
+        await asyncio.to_thread(
+            export_snapshot,
+            chroma_client,
+            path,
+            {name: physical_name(name) for name in COLLECTION_NAMES}
+        )
+        logger.info("Exported index snapshot")
+        response = FileResponse(
+            path,
+            media_type="application/zip",
+            filename="index.snapshot",
+            background=BackgroundTask(os.remove, path)
+        )
+        sent = True
+        return response
+    except SnapshotError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error exporting snapshot: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        # Once handed to the response, the file is removed after it has been sent
+        if not sent:
+            os.remove(path)
+
+@app.post("/admin/snapshot")
+async def upload_snapshot(file: UploadFile = File(...), x_admin_token: Optional[str] = Header(None)):
+    """Replace the collections with an uploaded snapshot file"""
+    check_admin_token(x_admin_token)
+    fd, path = tempfile.mkstemp(suffix=".snapshot")
+    try:
+        with os.fdopen(fd, "wb") as snapshot_file:
+            while chunk := await file.read(1024 * 1024):
+                snapshot_file.write(chunk)
+        counts = await asyncio.to_thread(load_snapshot, path)
+        return {"message": "Snapshot imported successfully", "collections": counts}
+    except SnapshotError as e:
+        logger.error(f"Rejected snapshot: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error importing snapshot: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        os.remove(path)
+
+def drop_index(state):
+    """Delete the collections and compact indexes of an index that is no longer live"""
+    live = set(active_index["collections"].values())
+    existing = {col.name for col in chroma_client.list_collections()}
+    for name in state["collections"].values():
+        if name in existing and name not in live:
+            chroma_client.delete_collection(name)
+            logger.info(f"Deleted replaced collection: {name}")
+    for name in list(state["compact"]):
+        drop_compact_index(name, state)
+
+def switch_index(completed_migration):
+    """Make a completed migration's shadow index live. Called with index_lock held."""
+    global active_index, corpus_version
+    new_state = make_index_state(
+        completed_migration.model_name,
+        completed_migration.embeddings,
+        dict(completed_migration.shadows)
+    )
+    if COMPACT_VECTORS:
+        for name in COLLECTION_NAMES:
+            rebuild_compact_index(name, new_state)
+    
+    # Recorded first: if this fails, the migration fails before anything was swapped
+    write_active_model(new_state["model"])
+    old_state = active_index
+    active_index = new_state
+    corpus_version += 1
+    logger.info(f"Switched live index to embedding model {new_state['model']}")
+    
+    # Requests that started before the switch may still be reading the old index
+    threading.Timer(OLD_INDEX_GRACE_SECONDS, drop_index, args=(old_state,)).start()
+
+@app.post("/admin/migration")
+async def start_migration(request: MigrationRequest, x_admin_token: Optional[str] = Header(None)):
+    """Start re-embedding the live index with a new model in the background"""
+    global migration
+    check_admin_token(x_admin_token)
+    if migration is not None and migration.running:
+        raise HTTPException(status_code=409, detail=f"A migration to {migration.model_name} is already running")
+    if request.model == active_index["model"]:
+        raise HTTPException(status_code=400, detail=f"The live index already uses {request.model}")
+    
+    model_name = request.model
+    verify_seconds = request.verify_seconds if request.verify_seconds is not None else MIGRATION_VERIFY_SECONDS
+    migration = EmbeddingMigration(
+        chroma_client,
+        model_name,
+        make_embeddings,
+        {name: physical_name(name) for name in COLLECTION_NAMES},
+        lambda name, metadata: {**metadata, "embedding_model": model_name, "index_name": name},
+        index_lock,
+        switch_index,
+        is_busy=lambda: active_requests > 0,
+        rate_limit=request.rate_limit or MIGRATION_RATE_LIMIT,
+        verify_seconds=None if request.require_confirmation else verify_seconds,
+        min_overlap=request.min_overlap if request.min_overlap is not None else MIGRATION_MIN_OVERLAP,
+        n_results=SESSION_CACHE_K
+    )
+    migration.start()
+    logger.info(f"Started embedding migration to {model_name}")
+    return migration.get_status()
+
+@app.get("/admin/migration")
+async def migration_status(x_admin_token: Optional[str] = Header(None)):
+    """Progress of the current migration and how the shadow index compares with the live one"""
+    check_admin_token(x_admin_token)
+    if migration is None:
+        return {"model": active_index["model"], "state": "idle"}
+    return migration.get_status()
+
+@app.post("/admin/migration/confirm")
+async def confirm_migration(x_admin_token: Optional[str] = Header(None)):
+    """Switch a verifying migration over now, skipping the rest of verification"""
+    check_admin_token(x_admin_token)
+    if migration is None or migration.state != "verifying":
+        raise HTTPException(status_code=409, detail="No migration is waiting in verification")
+    migration.confirm()
+    logger.info(f"Confirmed embedding migration to {migration.model_name}")
+    return migration.get_status()
+
+@app.delete("/admin/migration")
+async def cancel_migration(x_admin_token: Optional[str] = Header(None)):
+    """Stop a running migration and drop its shadow index"""
+    check_admin_token(x_admin_token)
+    if migration is None or not migration.running:
+        raise HTTPException(status_code=404, detail="No migration is running")
+    await asyncio.to_thread(migration.cancel)
+    logger.info(f"Cancelled embedding migration to {migration.model_name}")
+    return migration.get_status()
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
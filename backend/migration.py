@@ -0,0 +1,331 @@
+"""Background embedding model migration through a shadow index.
+
+An EmbeddingMigration re-embeds every live collection with a new model into
+shadow collections, in small batches at a throttled rate that backs off while
+live requests are in flight. Once every shadow collection is built, the
+migration verifies: it keeps catching up with uploads while sampled live
+queries are repeated against the shadow collections, with the same query
+shape, to measure how well the results overlap and how latency compares.
+After a set period (optionally only while the overlap holds up), or as soon
+as an admin confirms, the switch callback swaps the live index over
+atomically.
+"""
+import logging
+import re
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 1000  # Source records read per Chroma call
+MAX_BACKOFF = 2.0  # Longest pause (seconds) per batch while live traffic is busy
+VERIFY_POLL_SECONDS = 0.5  # How often verification checks whether it may switch
+VERIFY_CATCH_UP_SECONDS = 10.0  # How often verification catches up with new uploads
+
+
+def shadow_collection_name(collection_name: str, model_name: str) -> str:
+    """Physical name for a collection embedded with model_name"""
+    slug = re.sub(r"[^a-zA-Z0-9]+", "_", model_name).strip("_").lower()
+    return f"{collection_name}__{slug}"[:63]
+
+
+def _percentile(values, q):
+    return float(np.percentile(values, q)) if values else None
+
+
+class EmbeddingMigration:
+    def __init__(self, client, model_name, make_embeddings, sources, metadata_for,
+                 lock, switch, is_busy=lambda: False, rate_limit=50.0, batch_size=32,
+                 verify_seconds=0.0, min_overlap=None, n_results=4):
+        """
+        sources maps each logical collection name to its live physical name;
+        sources that do not exist yet are migrated if they appear before the switch.
+        metadata_for(logical_name, source_metadata) returns the shadow's metadata.
+        switch(migration) swaps the live index and is called with lock held.
+        rate_limit is in chunks per second.
+        verify_seconds is how long to verify before switching, or None to wait
+        for confirm(). With min_overlap set, the switch also waits until every
+        sampled collection's mean overlap with the live results reaches it.
+        n_results is the number of results the live queries fetch per collection.
+        """
+        self.client = client
+        self.model_name = model_name
+        self.make_embeddings = make_embeddings
+        self.sources = dict(sources)
+        self.metadata_for = metadata_for
+        self.lock = lock
+        self.switch = switch
+        self.is_busy = is_busy
+        self.rate_limit = rate_limit
+        self.batch_size = batch_size
+        self.verify_seconds = verify_seconds
+        self.min_overlap = min_overlap
+        self.n_results = n_results
+
+        self.embeddings = None
+        self.shadows = {name: shadow_collection_name(name, model_name) for name in self.sources}
+        self.state = "pending"
+        self.error = None
+        self.started_at = None
+        self.verify_started_at = None
+        self.finished_at = None
+        self.progress = {name: {"done": 0, "total": 0, "complete": False} for name in self.sources}
+        self._cancelled = threading.Event()
+        self._confirmed = threading.Event()
+        self._thread = None
+        self._stats_lock = threading.Lock()
+        self._shadow_stats = {
+            "queries": 0,
+            "overlap": {name: [] for name in self.sources},
+            "live_ms": [],
+            "shadow_ms": [],
+        }
+
+    def start(self):
+        self.started_at = time.time()
+        self.state = "loading_model"
+        self._thread = threading.Thread(target=self._run, name="embedding-migration", daemon=True)
+        self._thread.start()
+
+    def confirm(self):
+        """Switch now, without waiting out the verification period or the overlap gate"""
+        self._confirmed.set()
+
+    def cancel(self):
+        """Stop the migration and drop the shadow collections.
+
+        Cancelling while the switch is pending still stops it: the switch is
+        skipped if the cancellation arrives before it happens.
+        """
+        self._cancelled.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self.state != "complete":
+            self._drop_shadows()
+            self.state = "cancelled"
+
+    @property
+    def running(self):
+        return self.state in ("loading_model", "building", "verifying", "switching")
+
+    def _drop_shadows(self):
+        existing = {col.name for col in self.client.list_collections()}
+        for shadow in self.shadows.values():
+            if shadow in existing:
+                self.client.delete_collection(shadow)
+
+    def _run(self):
+        try:
+            self.embeddings = self.make_embeddings(self.model_name)
+            self.state = "building"
+            for name in self.sources:
+                self._build(name)
+                if self._cancelled.is_set():
+                    return
+                self.progress[name]["complete"] = True
+
+            # Catch up on uploads made during the build without blocking them,
+            # and keep doing so while verifying
+            self._catch_up(throttle=True)
+            if self._cancelled.is_set():
+                return
+            if not self._verify():
+                return
+
+            # Once more under the lock so nothing lands between catch-up and switch
+            self.state = "switching"
+            with self.lock:
+                self._catch_up(throttle=False)
+                if self._cancelled.is_set():
+                    return
+                self.switch(self)
+            self.state = "complete"
+            self.finished_at = time.time()
+            logger.info(f"Embedding migration to {self.model_name} complete")
+        except Exception as e:
+            logger.error(f"Embedding migration to {self.model_name} failed: {str(e)}")
+            logger.exception("Detailed stack trace for migration error:")
+            # Incomplete shadows carry index metadata and would be picked up as live on restart
+            try:
+                self._drop_shadows()
+            except Exception as drop_error:
+                logger.error(f"Error dropping shadow collections: {str(drop_error)}")
+            self.error = str(e)
+            self.state = "failed"
+
+    def _verify(self):
+        """Keep shadows caught up until the migration may switch. Returns False if cancelled."""
+        self.verify_started_at = time.time()
+        self.state = "verifying"
+        last_catch_up = time.time()
+        while not self._ready_to_switch():
+            if self._cancelled.wait(VERIFY_POLL_SECONDS):
+                return False
+            if time.time() - last_catch_up >= VERIFY_CATCH_UP_SECONDS:
+                self._catch_up(throttle=True)
+                last_catch_up = time.time()
+        return not self._cancelled.is_set()
+
+    def _overlap_by_collection(self):
+        with self._stats_lock:
+            return {
+                name: float(np.mean(values)) if values else None
+                for name, values in self._shadow_stats["overlap"].items()
+            }
+
+    def _ready_to_switch(self):
+        if self._confirmed.is_set():
+            return True
+        if self.verify_seconds is None or time.time() - self.verify_started_at < self.verify_seconds:
+            return False
+        if self.min_overlap is None:
+            return True
+        sampled = [overlap for overlap in self._overlap_by_collection().values() if overlap is not None]
+        return bool(sampled) and min(sampled) >= self.min_overlap
+
+    def _throttle(self, count, elapsed):
+        """Keep to rate_limit and give way to live requests"""
+        pause = max(0.0, count / self.rate_limit - elapsed)
+        waited = 0.0
+        while self.is_busy() and waited < MAX_BACKOFF and not self._cancelled.is_set():
+            time.sleep(0.05)
+            waited += 0.05
+        if pause > waited:
+            time.sleep(pause - waited)
+
+    def _shadow_collection(self, name):
+        source = self.client.get_collection(self.sources[name])
+        return self.client.get_or_create_collection(
+            self.shadows[name],
+            metadata=self.metadata_for(name, dict(source.metadata or {}))
+        )
+
+    def _embed_into(self, shadow, ids, documents, metadatas, throttle):
+        for start in range(0, len(ids), self.batch_size):
+            if self._cancelled.is_set():
+                return
+            batch_start = time.perf_counter()
+            end = start + self.batch_size
+            batch_metadatas = metadatas[start:end] if metadatas and any(metadatas[start:end]) else None
+            shadow.add(
+                ids=ids[start:end],
+                documents=documents[start:end],
+                embeddings=self.embeddings.embed_documents(documents[start:end]),
+                metadatas=batch_metadatas
+            )
+            if throttle:
+                self._throttle(len(ids[start:end]), time.perf_counter() - batch_start)
+
+    def _build(self, name):
+        if self.sources[name] not in {col.name for col in self.client.list_collections()}:
+            return  # Nothing to migrate yet, catch-up picks up later uploads
+        source = self.client.get_collection(self.sources[name])
+        shadow = self._shadow_collection(name)
+        self.progress[name]["total"] = source.count()
+        offset = 0
+        while not self._cancelled.is_set():
+            page = source.get(limit=PAGE_SIZE, offset=offset, include=["documents", "metadatas"])
+            if not page["ids"]:
+                break
+            self._embed_into(shadow, page["ids"], page["documents"], page["metadatas"], throttle=True)
+            offset += len(page["ids"])
+            self.progress[name]["done"] = offset
+
+    def _all_ids(self, collection):
+        ids = []
+        for offset in range(0, collection.count(), PAGE_SIZE):
+            ids.extend(collection.get(limit=PAGE_SIZE, offset=offset, include=[])["ids"])
+        return ids
+
+    def _catch_up(self, throttle):
+        """Bring each shadow in line with its source: add new records, drop deleted ones"""
+        existing = {col.name for col in self.client.list_collections()}
+        for name in self.sources:
+            if self.sources[name] not in existing:
+                # The source was cleared during the migration
+                if self.shadows[name] in existing:
+                    self.client.delete_collection(self.shadows[name])
+                self.progress[name] = {"done": 0, "total": 0, "complete": True}
+                continue
+            source = self.client.get_collection(self.sources[name])
+            shadow = self._shadow_collection(name)
+            source_ids = set(self._all_ids(source))
+            shadow_ids = set(self._all_ids(shadow))
+            stale = list(shadow_ids - source_ids)
+            if stale:
+                shadow.delete(ids=stale)
+            missing = list(source_ids - shadow_ids)
+            for start in range(0, len(missing), PAGE_SIZE):
+                page = source.get(ids=missing[start:start + PAGE_SIZE], include=["documents", "metadatas"])
+                self._embed_into(shadow, page["ids"], page["documents"], page["metadatas"], throttle)
+            self.progress[name]["total"] = self.progress[name]["done"] = len(source_ids)
+
+    def shadow_query(self, question, live_results, live_ms):
+        """Repeat a live query on the shadow collections and record the comparison.
+
+        Only runs while verifying, when every shadow collection is complete.
+        live_results maps every logical collection name to the documents the
+        live query returned for it. Shadows are queried the same way: the same
+        collections, n_results each, with embeddings included. live_ms covers
+        the live collection queries only, so the shadow timing likewise leaves
+        out embedding the question.
+        """
+        if self.state != "verifying" or self.embeddings is None:
+            return
+        query_embedding = self.embeddings.embed_query(question)
+        start = time.perf_counter()
+        existing = {col.name for col in self.client.list_collections()}
+        overlaps = {}
+        for name, live in live_results.items():
+            if self.shadows.get(name) not in existing:
+                continue  # Nothing to migrate for an empty source, its live results are empty too
+            shadow = self.client.get_collection(self.shadows[name])
+            count = shadow.count()
+            if not count:
+                continue
+            results = shadow.query(
+                query_embeddings=[query_embedding],
+                n_results=min(self.n_results, count),
+                include=["documents", "embeddings"]
+            )
+            if live:
+                overlaps[name] = len(set(results["documents"][0]) & set(live)) / len(live)
+        shadow_ms = (time.perf_counter() - start) * 1000
+        with self._stats_lock:
+            self._shadow_stats["queries"] += 1
+            self._shadow_stats["live_ms"].append(live_ms)
+            self._shadow_stats["shadow_ms"].append(shadow_ms)
+            for name, overlap in overlaps.items():
+                self._shadow_stats["overlap"][name].append(overlap)
+
+    def get_status(self) -> dict:
+        overlap_by_collection = self._overlap_by_collection()
+        with self._stats_lock:
+            stats = self._shadow_stats
+            overlaps = [overlap for values in stats["overlap"].values() for overlap in values]
+            shadow = {
+                "queries": stats["queries"],
+                "mean_overlap": float(np.mean(overlaps)) if overlaps else None,
+                "overlap_by_collection": overlap_by_collection,
+                "live_p50_ms": _percentile(stats["live_ms"], 50),
+                "live_p95_ms": _percentile(stats["live_ms"], 95),
+                "shadow_p50_ms": _percentile(stats["shadow_ms"], 50),
+                "shadow_p95_ms": _percentile(stats["shadow_ms"], 95),
+            }
+        return {
+            "model": self.model_name,
+            "state": self.state,
+            "error": self.error,
+            "started_at": self.started_at,
+            "verify_started_at": self.verify_started_at,
+            "finished_at": self.finished_at,
+            "verification": {
+                "seconds": self.verify_seconds,
+                "min_overlap": self.min_overlap,
+                "confirmed": self._confirmed.is_set(),
+            },
+            "progress": self.progress,
+            "shadow": shadow,
+        }
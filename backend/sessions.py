@@ -0,0 +1,169 @@
+"""Conversation sessions: follow-up rewriting, history and context reuse.
+
+Sessions live in an OrderedDict, least recently used first. Each one keeps
+its recent turns, the standalone question that set the current topic, and
+the chunks retrieved for that topic, so on-topic follow-ups are re-ranked
+locally instead of querying ChromaDB again. Nothing here touches ChromaDB or
+the LLM; retrieval is passed in as a callable.
+"""
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+MAX_SESSIONS = 1000  # Least recently used sessions are evicted beyond this
+SESSION_MAX_TURNS = 6  # Question/answer pairs kept per session
+SESSION_HISTORY_TOKENS = 600  # Approximate token budget for history in the prompt
+SESSION_TOPIC_THRESHOLD = 0.75  # Min cosine similarity to reuse the cached chunks
+CASUAL_PHRASES = ["hi", "hello", "thanks", "thank", "okay", "bye", "good morning", "good afternoon"]
+FOLLOW_UP_PREFIXES = ("and ", "what about", "how about", "what if", "also ", "same for", "then ")
+# Pronouns pointing back at the previous topic. "there" and "one" are left out:
+# they are mostly existential ("Is there a dress code?") or numbers.
+FOLLOW_UP_REFERENCES = {"it", "its", "that", "this", "those", "these", "they", "them"}
+# Words opening a self-contained question, so a short question starting with one is not a follow-up
+QUESTION_WORDS = {"what", "how", "who", "when", "where", "why", "which", "can", "could", "do", "does",
+                  "is", "are", "should", "will", "would"}
+FOLLOW_UP_MAX_WORDS = 3  # Shorter fragments without a question word ("Parental leave?") are follow-ups
+REFERENCE_MAX_WORDS = 5  # Longer questions only count as follow-ups when they open with a reference
+REWRITE_MAX_CHARS = 400  # Rewritten queries stay well inside the 256 tokens MiniLM reads
+
+
+def is_casual(text: str) -> bool:
+    """Check whether a message is small talk rather than a real question"""
+    return any(casual_phrase in text.lower() for casual_phrase in CASUAL_PHRASES)
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) used for prompt budgeting"""
+    return len(text) // 4 + 1
+
+
+def get_session(sessions: OrderedDict, session_id: Optional[str], corpus_version: int,
+                ttl: float, max_sessions: int = MAX_SESSIONS, now: Optional[float] = None) -> dict:
+    """Return the session for session_id, creating a new one if it is unknown or expired"""
+    now = time.time() if now is None else now
+    # Drop expired sessions from the least recently used end
+    while sessions:
+        oldest = next(iter(sessions.values()))
+        if now - oldest["updated"] <= ttl:
+            break
+        sessions.popitem(last=False)
+
+    session = sessions.get(session_id) if session_id else None
+    if session is None:
+        session_id = session_id or uuid.uuid4().hex
+        session = {
+            "id": session_id,
+            "history": deque(maxlen=SESSION_MAX_TURNS),
+            "topic_question": None,  # Last standalone question, the anchor for follow-ups
+            "last_follow_up": None,  # Latest follow-up on that topic
+            "topic_embedding": None,
+            "chunks": {},
+            "corpus_version": corpus_version,
+            "updated": now,
+        }
+        sessions[session_id] = session
+        while len(sessions) > max_sessions:
+            sessions.popitem(last=False)
+    sessions.move_to_end(session_id)
+    session["updated"] = now
+    return session
+
+
+def is_follow_up(text: str, session) -> bool:
+    """Whether a question continues the session's current topic.
+
+    Continuations ("and for...", "what about..."), short fragments without a
+    question word ("Parental leave?") and short questions or questions
+    opening with a pronoun referring back ("Is it mandatory?") count.
+    """
+    if not session["topic_question"] or is_casual(text):
+        return False
+    lowered = text.lower().strip()
+    words = [word.strip("?.,!") for word in lowered.split()]
+    if not words:
+        return False
+    if lowered.startswith(FOLLOW_UP_PREFIXES):
+        return True
+    if len(words) <= FOLLOW_UP_MAX_WORDS and words[0] not in QUESTION_WORDS:
+        return True
+    if words[0] in FOLLOW_UP_REFERENCES:
+        return True
+    return len(words) <= REFERENCE_MAX_WORDS and any(word in FOLLOW_UP_REFERENCES for word in words)
+
+
+def rewrite_follow_up(text: str, session) -> str:
+    """Turn a follow-up into a standalone question without an LLM call.
+
+    The follow-up is prefixed with the topic's standalone question and the
+    latest follow-up on it, dropping the latter first and then trimming the
+    standalone question so the result stays within REWRITE_MAX_CHARS.
+    """
+    if not is_follow_up(text, session):
+        return text
+    budget = REWRITE_MAX_CHARS - len(text) - 1
+    context = " ".join(part for part in (session["topic_question"], session["last_follow_up"]) if part)
+    if len(context) > budget:
+        context = session["topic_question"]
+    if len(context) > budget:
+        context = context[:max(budget, 0)].rsplit(" ", 1)[0] if budget > 0 else ""
+    return f"{context} {text}" if context else text
+
+
+def remember_question(session, text: str, follow_up: bool):
+    """Record an answered question as the topic anchor or its latest follow-up"""
+    if is_casual(text):
+        return
+    if follow_up:
+        session["last_follow_up"] = text
+    else:
+        session["topic_question"] = text
+        session["last_follow_up"] = None
+
+
+def format_history(session, budget: int = SESSION_HISTORY_TOKENS) -> str:
+    """Render the most recent turns that fit in the token budget"""
+    lines = []
+    for user_text, answer in reversed(session["history"]):
+        turn = f"User: {user_text}\nAssistant: {answer}"
+        cost = estimate_tokens(turn)
+        if cost > budget:
+            break
+        lines.append(turn)
+        budget -= cost
+    return "\n\n".join(reversed(lines))
+
+
+def rank_chunks(chunks, query_embedding, k: int) -> List[str]:
+    """Re-rank cached (document, embedding) pairs against a new query embedding"""
+    if not chunks:
+        return []
+    matrix = np.asarray([embedding for _, embedding in chunks], dtype=np.float32)
+    scores = matrix @ np.asarray(query_embedding, dtype=np.float32)
+    top = np.argsort(-scores)[:k]
+    return [chunks[i][0] for i in top]
+
+
+def retrieve_for_session(session, query_embedding, question_embedding, corpus_version: int,
+                         fetch: Callable[[object], Dict[str, list]],
+                         threshold: float = SESSION_TOPIC_THRESHOLD):
+    """Return cached chunks for on-topic questions, calling fetch(query_embedding) otherwise.
+
+    The topic check uses the embedding of the question as asked: a rewritten
+    follow-up contains the previous topic, so it would always look on topic.
+    """
+    topic = session["topic_embedding"]
+    if (
+        topic is not None
+        and session["corpus_version"] == corpus_version
+        and float(np.dot(topic, question_embedding)) >= threshold
+    ):
+        return session["chunks"], True
+
+    chunks = fetch(query_embedding)
+    session["chunks"] = chunks
+    session["topic_embedding"] = np.asarray(query_embedding, dtype=np.float32)
+    session["corpus_version"] = corpus_version
+    return chunks, False
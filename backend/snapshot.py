@@ -0,0 +1,225 @@
+"""Export and import ChromaDB collections as versioned snapshot files.
+
+A snapshot is a zip archive holding a manifest (format version, embedding
+model, chunking parameters and collection metadata) plus, per collection, the
+float32 embeddings as a .npy array and the ids, documents and metadatas as
+JSON. Importing bulk-loads the stored vectors, so nothing is re-embedded.
+
+Usage:
+    python snapshot.py export index.snapshot
+    python snapshot.py import index.snapshot --model all-MiniLM-L6-v2
+"""
+import argparse
+import io
+import json
+import time
+import zipfile
+import zlib
+
+import numpy as np
+
+SNAPSHOT_FORMAT_VERSION = 1
+PAGE_SIZE = 5000  # Records read or written per Chroma call
+DEFAULT_DB_PATH = "./chroma_db"
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+IMPORT_SUFFIX = "__import"  # Collections are loaded under this suffix, then renamed
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot cannot be read or does not match this deployment"""
+
+
+def read_collection(collection):
+    """Read all records of a collection page by page"""
+    ids, documents, metadatas, vectors = [], [], [], []
+    count = collection.count()
+    for offset in range(0, count, PAGE_SIZE):
+        page = collection.get(
+            limit=PAGE_SIZE,
+            offset=offset,
+            include=["embeddings", "documents", "metadatas"]
+        )
+        ids.extend(page["ids"])
+        documents.extend(page["documents"])
+        metadatas.extend(page["metadatas"])
+        vectors.append(np.asarray(page["embeddings"], dtype=np.float32))
+    embeddings = np.concatenate(vectors) if vectors else np.empty((0, 0), dtype=np.float32)
+    return ids, documents, metadatas, embeddings
+
+
+def export_snapshot(client, path, collection_names=None):
+    """Write the given collections (default: all) to a snapshot file.
+
+    collection_names is a list of names, or a dict mapping the name to store
+    in the snapshot to the ChromaDB collection to read. The embedding model
+    and chunking parameters are taken from the collection metadata, and every
+    exported collection must agree on the model.
+    """
+    if collection_names is None:
+        collection_names = [col.name for col in client.list_collections()]
+    if not isinstance(collection_names, dict):
+        collection_names = {name: name for name in collection_names}
+    existing = {col.name for col in client.list_collections()}
+    manifest = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "created_at": time.time(),
+        "embedding_model": None,
+        "collections": {},
+    }
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, source_name in collection_names.items():
+            if source_name not in existing:
+                continue
+            collection = client.get_collection(source_name)
+            metadata = dict(collection.metadata or {})
+            model = metadata.get("embedding_model")
+            if manifest["embedding_model"] is None:
+                manifest["embedding_model"] = model
+            elif model != manifest["embedding_model"]:
+                raise SnapshotError(
+                    f"Collection {name} was embedded with {model}, "
+                    f"others with {manifest['embedding_model']}"
+                )
+
+            ids, documents, metadatas, embeddings = read_collection(collection)
+            buffer = io.BytesIO()
+            np.save(buffer, embeddings)
+            archive.writestr(f"{name}/embeddings.npy", buffer.getvalue())
+            archive.writestr(f"{name}/records.json", json.dumps({
+                "ids": ids,
+                "documents": documents,
+                "metadatas": metadatas,
+            }))
+            manifest["collections"][name] = {
+                "count": len(ids),
+                "dimension": int(embeddings.shape[1]) if len(ids) else 0,
+                "metadata": metadata,
+                "chunking": {key: value for key, value in metadata.items() if key.startswith("chunk")},
+            }
+        archive.writestr("manifest.json", json.dumps(manifest, indent=2))
+    return manifest
+
+
+def read_manifest(path):
+    """Read and validate the manifest of a snapshot file"""
+    try:
+        with zipfile.ZipFile(path) as archive:
+            manifest = json.loads(archive.read("manifest.json"))
+    except (zipfile.BadZipFile, KeyError, ValueError) as e:
+        raise SnapshotError(f"Not a valid snapshot file: {e}")
+    if manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+        raise SnapshotError(
+            f"Unsupported snapshot format version {manifest.get('format_version')}, "
+            f"expected {SNAPSHOT_FORMAT_VERSION}"
+        )
+    return manifest
+
+
+def read_entry(archive, name, info):
+    """Read one collection from a snapshot and check it against its manifest entry"""
+    try:
+        embeddings = np.load(io.BytesIO(archive.read(f"{name}/embeddings.npy")))
+        records = json.loads(archive.read(f"{name}/records.json"))
+        ids, documents, metadatas = records["ids"], records["documents"], records["metadatas"]
+        count, dimension = info["count"], info["dimension"]
+    except (KeyError, TypeError, ValueError, OSError, zipfile.BadZipFile, zlib.error) as e:
+        raise SnapshotError(f"Collection {name} is missing or corrupt in the snapshot: {e!r}")
+    lengths = sorted({len(ids), len(documents), len(metadatas), len(embeddings)})
+    if lengths != [count]:
+        raise SnapshotError(f"Collection {name} has record counts {lengths}, the manifest says {count}")
+    if count and (embeddings.ndim != 2 or embeddings.shape[1] != dimension):
+        raise SnapshotError(
+            f"Collection {name} has embeddings of shape {embeddings.shape}, "
+            f"the manifest says dimension {dimension}"
+        )
+    if len(set(ids)) != count:
+        raise SnapshotError(f"Collection {name} has duplicate ids")
+    return ids, documents, metadatas, embeddings
+
+
+def import_snapshot(client, path, embedding_model, target_names=None):
+    """Replace collections with the contents of a snapshot, without re-embedding.
+
+    Refuses snapshots whose embedding model differs from embedding_model,
+    since their vectors would not be comparable with new query embeddings.
+    target_names optionally maps snapshot collection names to the ChromaDB
+    collections to load them into. Every collection is validated before any
+    is touched, and they are loaded under temporary names that replace the
+    targets only once all of them have loaded. Returns the manifest.
+    """
+    manifest = read_manifest(path)
+    if manifest.get("embedding_model") != embedding_model:
+        raise SnapshotError(
+            f"Snapshot was built with embedding model {manifest.get('embedding_model')}, "
+            f"but this server uses {embedding_model}"
+        )
+    entries = manifest.get("collections")
+    if not isinstance(entries, dict):
+        raise SnapshotError("Snapshot manifest does not list its collections")
+
+    existing = {col.name for col in client.list_collections()}
+    loaded = {}
+    with zipfile.ZipFile(path) as archive:
+        for name, info in entries.items():
+            read_entry(archive, name, info)
+
+        try:
+            for name, info in entries.items():
+                ids, documents, metadatas, embeddings = read_entry(archive, name, info)
+                target_name = (target_names or {}).get(name, name)
+                staging_name = target_name + IMPORT_SUFFIX
+                if staging_name in existing:
+                    client.delete_collection(staging_name)  # Left over from an interrupted import
+                collection = client.create_collection(staging_name, metadata=info.get("metadata") or None)
+                loaded[target_name] = collection
+                has_metadata = any(metadatas)
+                for start in range(0, len(ids), PAGE_SIZE):
+                    end = start + PAGE_SIZE
+                    collection.add(
+                        ids=ids[start:end],
+                        documents=documents[start:end],
+                        embeddings=embeddings[start:end].tolist(),
+                        metadatas=metadatas[start:end] if has_metadata else None
+                    )
+        except Exception:
+            for collection in loaded.values():
+                client.delete_collection(collection.name)
+            raise
+
+    for target_name, collection in loaded.items():
+        if target_name in existing:
+            client.delete_collection(target_name)
+        collection.modify(name=target_name)
+    return manifest
+
+
+def main():
+    import chromadb
+    from chromadb.config import Settings
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("path", help="Snapshot file to write or read")
+    parser.add_argument("--db-path", default=DEFAULT_DB_PATH, help="ChromaDB directory")
+    parser.add_argument("--collections", nargs="+", help="Collections to export (default: all)")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="Embedding model the importing server uses")
+    args = parser.parse_args()
+
+    client = chromadb.PersistentClient(
+        path=args.db_path,
+        settings=Settings(anonymized_telemetry=False, is_persistent=True)
+    )
+    start = time.time()
+    try:
+        if args.command == "export":
+            manifest = export_snapshot(client, args.path, args.collections)
+        else:
+            manifest = import_snapshot(client, args.path, args.model)
+    except SnapshotError as e:
+        raise SystemExit(f"Error: {e}")
+    counts = ", ".join(f"{name}: {info['count']}" for name, info in manifest["collections"].items())
+    print(f"{args.command.capitalize()}ed snapshot {args.path} ({counts}) in {time.time() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
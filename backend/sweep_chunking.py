@@ -0,0 +1,178 @@
+"""Offline sweep of chunking settings: retrieval quality against cost.
+
+For every strategy/size/overlap combination the corpus is chunked and
+embedded, and each labelled question is answered by brute-force cosine
+search. A question is a hit when one of the top-k chunks contains the start
+of its expected answer. Reported per setting:
+
+- chunks and index size (float32 vectors plus chunk text)
+- ingestion time (chunking + embedding)
+- hit rate @k
+- average prompt tokens of the top-k context (~4 characters per token)
+
+By default the labelled set is built from data/training.txt: the answers,
+grouped under their section headings, form the corpus and the questions are
+the queries (casual conversation entries are skipped). Use --corpus and
+--questions (JSONL with "question" and "answer") for other documents.
+
+Example:
+    python sweep_chunking.py --character-sizes 250 500 1000 --token-sizes 64 128 254
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from chunking import CHUNKING_STRATEGIES, chunk_document
+from extractors import Section, get_extractor
+
+TRAINING_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "training.txt")
+ANSWER_SNIPPET_CHARS = 60
+
+
+def normalize(text):
+    return " ".join(text.lower().split())
+
+
+def load_training_set(path=TRAINING_FILE):
+    """Build (sections, labelled questions) from the training Q&A file"""
+    sections, questions = [], []
+    heading, question, answer = "", None, []
+
+    def finish():
+        if question and answer:
+            text = "\n".join(answer).strip()
+            sections.append(Section("paragraph", text, heading))
+            if "casual" not in heading.lower():
+                questions.append({"question": question, "answer": text})
+
+    with open(path, "r") as file:
+        for line in file:
+            line = line.rstrip()
+            if line.startswith("#"):
+                finish()
+                question, answer = None, []
+                heading = line.lstrip("#").strip()
+                sections.append(Section("heading", heading, heading))
+            elif line.startswith("Q:"):
+                finish()
+                question, answer = line[2:].strip(), []
+            elif line.startswith("A:"):
+                answer = [line[2:].strip()]
+            elif question and answer:
+                answer.append(line)
+    finish()
+    return sections, questions
+
+
+def load_corpus(paths):
+    """Extract sections from corpus files with the upload extractors"""
+    sections = []
+    for path in paths:
+        with open(path, "rb") as file:
+            sections.extend(get_extractor(os.path.splitext(path)[1])(file.read()))
+    return sections
+
+
+def load_questions(path):
+    with open(path, "r") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def is_hit(chunks, answer):
+    snippet = normalize(answer)[:ANSWER_SNIPPET_CHARS]
+    return any(snippet in normalize(chunk) for chunk in chunks)
+
+
+def evaluate(embeddings, sections, questions, question_vectors, strategy, chunk_size, chunk_overlap, k):
+    start = time.perf_counter()
+    chunks = list(chunk_document(iter(sections), strategy, chunk_size, chunk_overlap, embeddings.model_name))
+    vectors = np.asarray(embeddings.embed_documents(chunks), dtype=np.float32)
+    ingest_time = time.perf_counter() - start
+
+    scores = question_vectors @ vectors.T
+    top = np.argsort(-scores, axis=1)[:, :k]
+    hits = 0
+    prompt_tokens = []
+    for row, labelled in zip(top, questions):
+        retrieved = [chunks[i] for i in row]
+        hits += is_hit(retrieved, labelled["answer"])
+        prompt_tokens.append(sum(len(chunk) // 4 + 1 for chunk in retrieved))
+
+    index_bytes = vectors.nbytes + sum(len(chunk.encode("utf-8")) for chunk in chunks)
+    return {
+        "strategy": strategy,
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "chunks": len(chunks),
+        "index_kb": index_bytes / 1024,
+        "ingest_s": ingest_time,
+        "hit_rate": hits / len(questions),
+        "prompt_tokens": float(np.mean(prompt_tokens)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", nargs="+", help="Documents to chunk (default: built from training.txt)")
+    parser.add_argument("--questions", help="JSONL labelled questions, required with --corpus")
+    parser.add_argument("--strategies", nargs="+", default=list(CHUNKING_STRATEGIES), choices=CHUNKING_STRATEGIES)
+    parser.add_argument("--character-sizes", type=int, nargs="+", default=[250, 500, 1000],
+                        help="Chunk sizes in characters for the character and sentence strategies")
+    parser.add_argument("--token-sizes", type=int, nargs="+", default=[64, 128, 254],
+                        help="Chunk sizes in tokens for the token strategy, at most the model's "
+                             "maximum sequence length minus 2 (254 for all-MiniLM-L6-v2)")
+    parser.add_argument("--overlap-ratios", type=float, nargs="+", default=[0.0, 0.2])
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--tolerance", type=float, default=0.02,
+                        help="Hit rate a setting may lose against the best and still be recommended")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    args = parser.parse_args()
+
+    if args.corpus:
+        if not args.questions:
+            parser.error("--questions is required with --corpus")
+        sections, questions = load_corpus(args.corpus), load_questions(args.questions)
+    else:
+        sections, questions = load_training_set()
+
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    embeddings = HuggingFaceEmbeddings(
+        model_name=args.model,
+        model_kwargs={'device': 'cpu'},
+        encode_kwargs={'normalize_embeddings': True}
+    )
+    question_vectors = np.asarray(
+        embeddings.embed_documents([labelled["question"] for labelled in questions]),
+        dtype=np.float32
+    )
+
+    print(f"{len(questions)} labelled questions")
+    print("strategy | size | overlap | chunks | index_kb | ingest_s | hit_rate | prompt_tokens")
+    results = []
+    for strategy in args.strategies:
+        sizes = args.token_sizes if strategy == "token" else args.character_sizes
+        for chunk_size in sizes:
+            for ratio in args.overlap_ratios:
+                result = evaluate(embeddings, sections, questions, question_vectors, strategy,
+                                  chunk_size, int(chunk_size * ratio), args.k)
+                results.append(result)
+                print(f"{strategy} | {chunk_size} | {result['chunk_overlap']} | {result['chunks']} | "
+                      f"{result['index_kb']:.1f} | {result['ingest_s']:.2f} | {result['hit_rate']:.3f} | "
+                      f"{result['prompt_tokens']:.0f}", flush=True)
+
+    best_hit_rate = max(result["hit_rate"] for result in results)
+    eligible = [result for result in results if result["hit_rate"] >= best_hit_rate - args.tolerance]
+    cheapest = min(eligible, key=lambda result: (result["prompt_tokens"], result["index_kb"]))
+    print(
+        f"\nCheapest setting within {args.tolerance:.0%} of the best hit rate ({best_hit_rate:.3f}): "
+        f"CHUNKING_STRATEGY={cheapest['strategy']} CHUNK_SIZE={cheapest['chunk_size']} "
+        f"CHUNK_OVERLAP={cheapest['chunk_overlap']} (hit rate {cheapest['hit_rate']:.3f}, "
+        f"{cheapest['prompt_tokens']:.0f} prompt tokens)"
+    )
+
+
+if __name__ == "__main__":
+    main()
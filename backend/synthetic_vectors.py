@@ -0,0 +1,43 @@
+"""Synthetic embedding corpora and exact search for the index benchmarks.
+
+Generates clustered, normalized 384-d vectors (the shape of all-MiniLM-L6-v2
+embeddings) and the brute-force ground truth that approximate indexes are
+scored against. Needs only numpy.
+"""
+import numpy as np
+
+DIMENSION = 384
+BATCH_SIZE = 50000
+
+
+def generate_corpus(size, dimension=DIMENSION, seed=0):
+    """Generate normalized vectors grouped around random topic centers"""
+    rng = np.random.default_rng(seed)
+    n_clusters = max(10, int(np.sqrt(size)))
+    centers = rng.standard_normal((n_clusters, dimension)).astype(np.float32)
+    vectors = np.empty((size, dimension), dtype=np.float32)
+    for start in range(0, size, BATCH_SIZE):
+        end = min(start + BATCH_SIZE, size)
+        labels = rng.integers(0, n_clusters, end - start)
+        noise = rng.standard_normal((end - start, dimension)).astype(np.float32)
+        vectors[start:end] = centers[labels] + 0.6 * noise
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors, centers
+
+
+def generate_queries(centers, count, dimension=DIMENSION, seed=1):
+    """Generate queries drawn from the same topics as the corpus"""
+    rng = np.random.default_rng(seed)
+    labels = rng.integers(0, len(centers), count)
+    queries = centers[labels] + 0.6 * rng.standard_normal((count, dimension)).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def brute_force(vectors, queries, k):
+    """Exact top-k by cosine similarity (vectors are normalized)"""
+    truth = np.empty((len(queries), k), dtype=np.int64)
+    for start in range(0, len(queries), 100):
+        scores = queries[start:start + 100] @ vectors.T
+        top = np.argpartition(-scores, k, axis=1)[:, :k]
+        truth[start:start + 100] = top
+    return truth
@@ -19,6 +19,7 @@ export default function Home() {
   const [hasAskedFirstQuestion, setHasAskedFirstQuestion] = useState(false);
   const [isFileUploaded, setIsFileUploaded] = useState(false);
   const [serverStatus, setServerStatus] = useState<'connected' | 'disconnected' | 'connecting'>('connecting');
+  const [sessionId, setSessionId] = useState<string | null>(null);
   const messagesEndRef = useRef<HTMLDivElement>(null);
 
   // Check server status on component mount
@@ -111,6 +112,7 @@ export default function Home() {
       setError(null);
       setHasAskedFirstQuestion(false);
       setIsFileUploaded(false);
+      setSessionId(null);
       
       // Reset file input element
       const fileInput = document.getElementById('file-upload') as HTMLInputElement;
@@ -140,7 +142,7 @@ export default function Home() {
       setMessages(prev => [...prev, { type: 'user', content: question }]);
       
       console.log("Sending request to:", `${API_URL}/ask`);
-      console.log("Request payload:", { text: question });
+      console.log("Request payload:", { text: question, session_id: sessionId });
       
       // Store the question to clear the input immediately
       const currentQuestion = question;
@@ -148,6 +150,7 @@ export default function Home() {
       
       const response = await axios.post(`${API_URL}/ask`, {
         text: currentQuestion,  // Use stored question
+        session_id: sessionId,  // Lets the server reuse context for follow-ups
       }, {
         // Add timeout to prevent hanging requests
         timeout: 60000,
@@ -160,6 +163,7 @@ export default function Home() {
       
       console.log("Response received:", response.data);
       setServerStatus('connected'); // Update server status on successful response
+      setSessionId(response.data.session_id);
       
       // Add bot message
       setMessages(prev => [...prev, { type: 'bot', content: response.data.answer }]);
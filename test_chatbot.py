@@ -5,7 +5,7 @@ import time
 # API endpoint
 API_URL = "http://localhost:8000"
 
-def test_ask_question(question):
+def test_ask_question(question, session_id=None):
     """Test the ask endpoint with a question"""
     print(f"\nQuestion: {question}")
     
@@ -13,7 +13,7 @@ def test_ask_question(question):
     
     response = requests.post(
         f"{API_URL}/ask",
-        json={"text": question}
+        json={"text": question, "session_id": session_id}
     )
     
     end_time = time.time()
@@ -33,6 +33,15 @@ def test_ask_question(question):
         print(response.text)
     
     print("-" * 80)
+    return response.json().get("session_id") if response.status_code == 200 else None
+
+def test_conversation(questions):
+    """Test follow-up questions within a single conversation session"""
+    print("\nTesting conversation session...")
+    session_id = None
+    for question in questions:
+        session_id = test_ask_question(question, session_id)
+        time.sleep(1)
 
 def main():
     print("Testing the improved chatbot...")
@@ -52,6 +61,13 @@ def main():
     for question in questions:
         test_ask_question(question)
         time.sleep(1)  # Small delay between requests
+    
+    # Follow-ups should reuse the session's context and answer faster
+    test_conversation([
+        "How do I request time off?",
+        "And for sick leave?",
+        "How many days is that per year?"
+    ])
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
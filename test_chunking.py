@@ -0,0 +1,113 @@
+import os
+import string
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+import chunking
+from chunking import chunk_document, tokenizer_name
+from extractors import Section, chunk_sections
+
+SENTENCE = "Employees request annual leave through the HR portal at least two weeks ahead. "
+
+def sample_sections():
+    """Short and oversized sections under long and short headings"""
+    sections = [Section("paragraph", "Preamble before any heading. " * 3, "")]
+    for heading in ["Leave Policy and Absence Management for Permanent Staff", "VPN"]:
+        sections.append(Section("heading", heading, heading))
+        sections.append(Section("paragraph", SENTENCE * 20, heading))
+        sections.extend(Section("list_item", f"Item {i}: {SENTENCE}", heading) for i in range(8))
+        sections.append(Section("table_row", "Annual | 25 days", heading))
+    return sections
+
+def test_character_and_sentence_bounds():
+    """Chunks, heading included, never exceed CHUNK_SIZE characters"""
+    for strategy in ("character", "sentence"):
+        for chunk_size, chunk_overlap in [(300, 50), (500, 100), (1000, 200)]:
+            chunks = list(chunk_document(iter(sample_sections()), strategy, chunk_size, chunk_overlap))
+            longest = max(len(chunk) for chunk in chunks)
+            print(f"{strategy} size {chunk_size}: {len(chunks)} chunks, longest {longest}")
+            assert longest <= chunk_size
+
+def test_chunks_start_with_heading():
+    chunks = list(chunk_document(iter(sample_sections()), "character", 300, 50))
+    vpn_chunks = [chunk for chunk in chunks if chunk.startswith("VPN\n")]
+    assert len(vpn_chunks) > 1
+    assert not any("Preamble" in chunk for chunk in vpn_chunks)
+
+def test_custom_length_bounds():
+    """Bounds hold for other length measures, as with the token strategy"""
+    def word_count(text):
+        return len(text.split())
+
+    def splitter_for(size):
+        return RecursiveCharacterTextSplitter(chunk_size=size, chunk_overlap=min(4, size // 2),
+                                              length_function=word_count)
+
+    for chunk_size in (16, 40, 64):
+        chunks = list(chunk_sections(iter(sample_sections()), splitter_for, chunk_size, word_count))
+        assert max(word_count(chunk) for chunk in chunks) <= chunk_size
+
+def test_long_heading_is_not_repeated():
+    """A heading longer than half a chunk would crowd out the text, so it is dropped"""
+    heading = "Very long heading " * 10
+    sections = [Section("heading", heading, heading), Section("paragraph", SENTENCE * 5, heading)]
+    chunks = list(chunk_document(iter(sections), "character", 200, 20))
+    assert all(len(chunk) <= 200 for chunk in chunks)
+    assert not any(chunk.startswith("Very long heading") for chunk in chunks)
+
+def make_tokenizer(vocabulary):
+    """Local WordPiece tokenizer, standing in for a model's tokenizer from the hub"""
+    from tokenizers import Tokenizer, normalizers, pre_tokenizers
+    from tokenizers.models import WordPiece
+    from transformers import PreTrainedTokenizerFast
+    tokens = ["[UNK]"] + sorted(vocabulary)
+    tokenizer = Tokenizer(WordPiece({token: i for i, token in enumerate(tokens)}, unk_token="[UNK]"))
+    tokenizer.normalizer = normalizers.Lowercase()
+    tokenizer.pre_tokenizer = pre_tokenizers.BertPreTokenizer()
+    return PreTrainedTokenizerFast(tokenizer_object=tokenizer, unk_token="[UNK]")
+
+def test_token_strategy_uses_the_embedding_model():
+    """Token sizes are counted with the tokenizer of the model passed in"""
+    words = {word.strip(".:|").lower() for section in sample_sections() for word in section.text.split()}
+    characters = set(string.ascii_lowercase + string.digits)
+    tokenizers = {
+        # One token per word, and one per character
+        "word-model": make_tokenizer(words | set(".:|")),
+        "org/char-model": make_tokenizer(characters | {f"##{c}" for c in characters} | set(".:|")),
+    }
+    requested = []
+
+    def get_tokenizer(embedding_model=chunking.DEFAULT_EMBEDDING_MODEL):
+        requested.append(embedding_model)
+        return tokenizers[embedding_model]
+
+    original = chunking.get_tokenizer
+    chunking.get_tokenizer = get_tokenizer
+    try:
+        counts = {}
+        for model, tokenizer in tokenizers.items():
+            chunks = list(chunk_document(iter(sample_sections()), "token", 64, 8, model))
+            longest = max(len(tokenizer.encode(chunk, add_special_tokens=False)) for chunk in chunks)
+            assert longest <= 64, (model, longest)
+            counts[model] = len(chunks)
+    finally:
+        chunking.get_tokenizer = original
+    assert set(requested) == set(tokenizers)
+    assert counts["org/char-model"] > counts["word-model"]
+    assert tokenizer_name("all-MiniLM-L6-v2") == "sentence-transformers/all-MiniLM-L6-v2"
+    assert tokenizer_name("BAAI/bge-small-en-v1.5") == "BAAI/bge-small-en-v1.5"
+
+def main():
+    print("Testing chunking strategies...")
+    test_character_and_sentence_bounds()
+    test_chunks_start_with_heading()
+    test_custom_length_bounds()
+    test_long_heading_is_not_repeated()
+    test_token_strategy_uses_the_embedding_model()
+    print("All chunking tests passed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import os
+import sys
+import threading
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from compact_index import QUANTIZATION_MODES, CompactVectorIndex
+from synthetic_vectors import brute_force, generate_corpus, generate_queries
+
+K = 4
+
+def test_recall_against_brute_force():
+    """Quantized search with exact re-scoring matches brute force closely"""
+    vectors, centers = generate_corpus(5000)
+    queries = generate_queries(centers, 100)
+    truth = brute_force(vectors, queries, K)
+    ids = [str(i) for i in range(len(vectors))]
+    for mode in QUANTIZATION_MODES:
+        index = CompactVectorIndex(vectors.shape[1], mode=mode, rescore_factor=4, initial_capacity=16)
+        try:
+            index.add(ids, vectors)
+            hits = 0
+            for query, expected in zip(queries, truth):
+                found = {int(id_) for id_, _ in index.search(query, K)}
+                hits += len(found & set(expected))
+            recall = hits / truth.size
+            usage = index.memory_usage()
+            print(f"{mode}: recall@{K} {recall:.3f}, {usage['compact_bytes'] / usage['float32_bytes']:.0%} of float32")
+            assert recall >= 0.98
+            assert usage["compact_bytes"] < usage["float32_bytes"]
+        finally:
+            index.close(remove=True)
+
+def test_duplicate_ids_are_ignored():
+    """add() keeps the first vector for an id, like Chroma"""
+    index = CompactVectorIndex(3, mode="int8")
+    try:
+        assert index.add(["a"], [[1.0, 0.0, 0.0]]) == 1
+        assert index.add(["a", "b"], [[0.0, 1.0, 0.0], [0.0, 0.0, 1.0]]) == 1
+        assert len(index) == 2
+        np.testing.assert_allclose(index.get_vectors(["a"])[0], [1.0, 0.0, 0.0])
+    finally:
+        index.close(remove=True)
+
+def test_indexes_do_not_share_vectors():
+    """Two indexes (as in two workers) keep separate full-precision vectors"""
+    first = CompactVectorIndex(3, mode="int8")
+    second = CompactVectorIndex(3, mode="int8")
+    try:
+        assert first.path != second.path
+        first.add(["a"], [[1.0, 0.0, 0.0]])
+        second.add(["b"], [[0.0, 1.0, 0.0]])
+        np.testing.assert_allclose(first.get_vectors(["a"])[0], [1.0, 0.0, 0.0])
+        assert first.search([1.0, 0.0, 0.0], 1)[0][0] == "a"
+    finally:
+        first.close(remove=True)
+        second.close(remove=True)
+    assert not os.path.exists(os.path.dirname(first.path))
+
+def test_search_while_growing():
+    """Searches running alongside add() never see a half-grown index"""
+    vectors, _ = generate_corpus(4000)
+    index = CompactVectorIndex(vectors.shape[1], mode="int8", initial_capacity=1)
+    errors = []
+    done = threading.Event()
+
+    def search():
+        while not done.is_set():
+            try:
+                for id_, score in index.search(vectors[0], 8):
+                    assert -1.01 <= score <= 1.01
+                    np.testing.assert_allclose(index.get_vectors([id_])[0], vectors[int(id_)], rtol=1e-6)
+            except Exception as error:
+                errors.append(error)
+                return
+
+    readers = [threading.Thread(target=search) for _ in range(2)]
+    try:
+        index.add(["0"], vectors[:1])
+        for reader in readers:
+            reader.start()
+        # Small batches force many reallocations of the codes and the memory map
+        for start in range(1, len(vectors), 7):
+            index.add([str(i) for i in range(start, min(start + 7, len(vectors)))], vectors[start:start + 7])
+    finally:
+        done.set()
+        for reader in readers:
+            reader.join()
+        index.close(remove=True)
+    assert not errors, errors[0]
+
+def main():
+    print("Testing compact vector index...")
+    test_recall_against_brute_force()
+    test_duplicate_ids_are_ignored()
+    test_indexes_do_not_share_vectors()
+    test_search_while_growing()
+    print("All compact index tests passed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from embedding_cache import EmbeddingCache, normalize_text, tokenizer_lowercases
+
+class CountingEmbedder:
+    """Stand-in for embed_query that records how often the model runs"""
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, text):
+        self.calls += 1
+        return [float(len(text)), float(sum(map(ord, text)) % 997), 1.0]
+
+def test_hits_across_instances():
+    """A question embedded by one worker is a disk hit for another"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "cache.sqlite3")
+        embedder = CountingEmbedder()
+        first = EmbeddingCache(embedder, "model-a", path)
+        second = EmbeddingCache(embedder, "model-a", path)
+
+        vector = first.embed("How do I reset my password?")
+        assert first.embed("How do I reset my password?") == vector
+        assert second.embed("How do I  reset my password? ") == vector
+        assert embedder.calls == 1
+        assert first.get_stats()["worker"]["memory_hits"] == 1
+        assert second.get_stats()["worker"]["disk_hits"] == 1
+
+        # Entries are per model
+        other = EmbeddingCache(embedder, "model-b", path)
+        other.embed("How do I reset my password?")
+        assert embedder.calls == 2
+
+def test_stats_cover_all_workers():
+    """Hit rates come from counters shared through the SQLite file"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "cache.sqlite3")
+        first = EmbeddingCache(CountingEmbedder(), "model-a", path)
+        second = EmbeddingCache(CountingEmbedder(), "model-a", path)
+        first.embed("What is the VPN policy?")
+        first.embed("What is the VPN policy?")
+        second.embed("What is the VPN policy?")
+        second.embed("What is the VPN policy?")
+
+        stats = first.get_stats()
+        # second's lookups are still pending in that process
+        assert (stats["misses"], stats["memory_hits"], stats["disk_hits"]) == (1, 1, 0)
+        stats = second.get_stats()
+        assert (stats["misses"], stats["memory_hits"], stats["disk_hits"]) == (1, 2, 1)
+        assert stats["hit_rate"] == 0.75
+        assert stats["worker"]["pid"] == os.getpid()
+        assert stats["worker"]["hit_rate"] == 1.0
+        assert first.get_stats()["hit_rate"] == 0.75
+
+        # Counters are per model
+        assert EmbeddingCache(CountingEmbedder(), "model-b", path).get_stats()["hit_rate"] == 0.0
+
+def test_case_is_kept_for_cased_models():
+    """Only caches for uncased models share entries between different casings"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        embedder = CountingEmbedder()
+        cased = EmbeddingCache(embedder, "cased", os.path.join(tmp_dir, "cased.sqlite3"))
+        cased.embed("Apple")
+        cased.embed("apple")
+        assert embedder.calls == 2
+
+        uncased = EmbeddingCache(embedder, "uncased", os.path.join(tmp_dir, "uncased.sqlite3"), lowercase=True)
+        uncased.embed("Apple")
+        uncased.embed("apple")
+        assert embedder.calls == 3
+
+def test_normalize_text():
+    assert normalize_text("  What is\tVPN?\n") == "What is VPN?"
+    assert normalize_text("What is VPN?", lowercase=True) == "what is vpn?"
+
+def test_tokenizer_lowercases():
+    class Tokenizer:
+        def __init__(self, **kwargs):
+            self.init_kwargs = kwargs
+    uncased = Tokenizer()
+    uncased.do_lower_case = True
+    assert tokenizer_lowercases(uncased)
+    assert tokenizer_lowercases(Tokenizer(do_lower_case=True))
+    assert not tokenizer_lowercases(Tokenizer())
+    assert not tokenizer_lowercases(None)
+
+def test_disk_tier_is_pruned():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        import embedding_cache
+        interval = embedding_cache.PRUNE_INTERVAL
+        embedding_cache.PRUNE_INTERVAL = 10
+        try:
+            cache = EmbeddingCache(CountingEmbedder(), "model", os.path.join(tmp_dir, "cache.sqlite3"), disk_size=5)
+            for i in range(20):
+                cache.embed(f"question {i}")
+            assert cache.get_stats()["disk_entries"] <= 10
+        finally:
+            embedding_cache.PRUNE_INTERVAL = interval
+
+def main():
+    print("Testing query embedding cache...")
+    test_hits_across_instances()
+    test_stats_cover_all_workers()
+    test_case_is_kept_for_cased_models()
+    test_normalize_text()
+    test_tokenizer_lowercases()
+    test_disk_tier_is_pruned()
+    print("All embedding cache tests passed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from extractors import (
+    Section,
+    extract_docx,
+    extract_html,
+    extract_markdown,
+    extract_pdf,
+    extract_text,
+    get_extractor,
+)
+
+def make_pdf(lines):
+    """Build a minimal one-page PDF showing the given lines of text"""
+    stream = "BT /F1 12 Tf 72 720 Td 14 TL " + " ".join(f"({line}) Tj T*" for line in lines) + " ET"
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+        "/Contents 4 0 R /Resources << /Font << /F1 5 0 R >> >> >>",
+        f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    pdf = "%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(pdf))
+        pdf += f"{number} 0 obj\n{body}\nendobj\n"
+    xref = len(pdf)
+    pdf += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n"
+    pdf += "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    pdf += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    return pdf.encode("latin-1")
+
+def test_registry():
+    assert get_extractor(".PDF") is extract_pdf
+    assert get_extractor(None, "text/html; charset=utf-8") is extract_html
+    assert get_extractor(".md") is extract_markdown
+    assert get_extractor(".unknown", "application/octet-stream") is extract_text
+
+def test_text():
+    sections = list(extract_text(b"First line\nsecond line\n\n\nNext paragraph\n"))
+    assert sections == [
+        Section("paragraph", "First line\nsecond line", ""),
+        Section("paragraph", "Next paragraph", ""),
+    ]
+
+def test_markdown():
+    content = b"""Intro text
+# Leave
+Annual leave is
+25 days.
+
+- Sick leave
+1. Parental leave
+
+| Type | Days |
+|------|-----:|
+| Annual | 25 |
+
+```
+code line
+```
+"""
+    assert list(extract_markdown(content)) == [
+        Section("paragraph", "Intro text", ""),
+        Section("heading", "Leave", "Leave"),
+        Section("paragraph", "Annual leave is 25 days.", "Leave"),
+        Section("list_item", "Sick leave", "Leave"),
+        Section("list_item", "Parental leave", "Leave"),
+        Section("table_row", "Type | Days", "Leave"),
+        Section("table_row", "Annual | 25", "Leave"),
+        Section("code", "code line", "Leave"),
+    ]
+
+def test_html():
+    content = b"""<html><head><title>Ignored</title><style>p { color: red }</style></head><body>
+<h1>Leave</h1>
+<ul><li><p>Annual</p><p>leave</p></li><li>Sick<li>Parental</ul>
+<table><tr><th>Type</th><th>Days</th></tr><tr><td><p>Annual</p></td><td>25</td></tr></table>
+<p>Unclosed<h2>IT</h2><script>ignored()</script><p>VPN &amp; Wi-Fi</p>
+</body></html>"""
+    assert list(extract_html(content)) == [
+        Section("heading", "Leave", "Leave"),
+        Section("list_item", "Annual leave", "Leave"),
+        Section("list_item", "Sick", "Leave"),
+        Section("list_item", "Parental", "Leave"),
+        Section("table_row", "Type | Days", "Leave"),
+        Section("table_row", "Annual | 25", "Leave"),
+        Section("paragraph", "Unclosed", "Leave"),
+        Section("heading", "IT", "IT"),
+        Section("paragraph", "VPN & Wi-Fi", "IT"),
+    ]
+
+def test_html_across_blocks():
+    """Sections split across fed blocks come out the same"""
+    content = "<h1>Policies</h1>" + "".join(f"<p>Paragraph {i}</p>" for i in range(50))
+    sections = list(extract_html(content.encode(), block_size=7))
+    assert len(sections) == 51
+    assert sections[-1] == Section("paragraph", "Paragraph 49", "Policies")
+
+def test_docx():
+    from docx import Document
+
+    document = Document()
+    document.add_heading("Leave", level=1)
+    document.add_paragraph("Annual leave is 25 days.")
+    document.add_paragraph("Sick leave", style="List Bullet")
+    table = document.add_table(rows=2, cols=2)
+    table.cell(0, 0).text, table.cell(0, 1).text = "Type", "Days"
+    table.cell(1, 0).text, table.cell(1, 1).text = "Annual", "25"
+    buffer = io.BytesIO()
+    document.save(buffer)
+
+    assert list(extract_docx(buffer.getvalue())) == [
+        Section("heading", "Leave", "Leave"),
+        Section("paragraph", "Annual leave is 25 days.", "Leave"),
+        Section("list_item", "Sick leave", "Leave"),
+        Section("table_row", "Type | Days", "Leave"),
+        Section("table_row", "Annual | 25", "Leave"),
+    ]
+
+def test_pdf():
+    sections = list(extract_pdf(make_pdf(["Annual leave policy", "25 days per year"])))
+    assert len(sections) == 1
+    assert sections[0].kind == "page"
+    assert "Annual leave policy" in sections[0].text
+    assert "25 days per year" in sections[0].text
+
+def main():
+    print("Testing document extractors...")
+    test_registry()
+    test_text()
+    test_markdown()
+    test_html()
+    test_html_across_blocks()
+    test_docx()
+    test_pdf()
+    print("All extractor tests passed")
+
+if __name__ == "__main__":
+    main()
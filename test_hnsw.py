@@ -0,0 +1,41 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from benchmark_hnsw import build_index, evaluate
+from synthetic_vectors import brute_force, generate_corpus, generate_queries
+
+K = 4
+
+def test_brute_force_is_exact():
+    """brute_force returns the true top-k by cosine similarity"""
+    vectors, centers = generate_corpus(2000)
+    queries = generate_queries(centers, 20)
+    truth = brute_force(vectors, queries, K)
+    for query, expected in zip(queries, truth):
+        scores = vectors @ query
+        assert set(expected) == set(np.argsort(-scores)[:K])
+
+def test_configured_operating_point_recall():
+    """The hr_it_docs HNSW settings in main.py keep recall@4 close to brute force"""
+    vectors, centers = generate_corpus(5000)
+    queries = generate_queries(centers, 200)
+    truth = brute_force(vectors, queries, K)
+    index, _, memory = build_index(vectors, "cosine", m=32, construction_ef=200)
+    low_recall, _, _ = evaluate(index, queries, truth, K, search_ef=10)
+    recall, _, _ = evaluate(index, queries, truth, K, search_ef=64)
+    print(f"recall@{K}: search_ef=10 {low_recall:.3f}, search_ef=64 {recall:.3f}, index {memory / 1e6:.1f}MB")
+    assert recall >= 0.98
+    assert recall >= low_recall
+
+def main():
+    print("Testing HNSW benchmark helpers...")
+    test_brute_force_is_exact()
+    test_configured_operating_point_recall()
+    print("All HNSW tests passed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import chromadb
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+import migration as migration_module
+from migration import EmbeddingMigration, shadow_collection_name
+
+MODEL = "new-model"
+
+class HashEmbeddings:
+    """Stand-in for HuggingFaceEmbeddings with deterministic vectors"""
+    def __init__(self, fail_after=None):
+        self.fail_after = fail_after
+        self.calls = 0
+
+    def _embed(self, text):
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:4], "little")
+        vector = np.random.default_rng(seed).standard_normal(8)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        if self.fail_after is not None and self.calls > self.fail_after:
+            raise RuntimeError("model crashed")
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+def fill_collection(client, name, count):
+    collection = client.create_collection(name, metadata={"hnsw:space": "cosine", "embedding_model": "old-model"})
+    documents = [f"{name} document {i}" for i in range(count)]
+    collection.add(
+        ids=[f"doc_{i}" for i in range(count)],
+        documents=documents,
+        embeddings=HashEmbeddings().embed_documents(["old " + document for document in documents])
+    )
+    return collection
+
+def make_migration(client, sources, embeddings, switched, rate_limit=10000.0, lock=None, **options):
+    return EmbeddingMigration(
+        client,
+        MODEL,
+        lambda model_name: embeddings,
+        sources,
+        lambda name, metadata: {**metadata, "embedding_model": MODEL, "index_name": name},
+        lock or threading.Lock(),
+        switched.append,
+        rate_limit=rate_limit,
+        batch_size=8,
+        **options
+    )
+
+def wait_for(condition, timeout=30.0):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError("Timed out waiting for the migration")
+        time.sleep(0.02)
+
+def collection_names(client):
+    return {col.name for col in client.list_collections()}
+
+def test_completes_and_switches():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        client = chromadb.PersistentClient(path=tmp_dir)
+        source = fill_collection(client, "hr_it_docs", 50)
+        switched = []
+        migration = make_migration(client, {"hr_it_docs": "hr_it_docs", "training_data": "training_data"},
+                                   HashEmbeddings(), switched)
+        migration.start()
+        wait_for(lambda: not migration.running)
+
+        status = migration.get_status()
+        assert status["state"] == "complete", status
+        assert switched == [migration]
+        assert status["progress"]["hr_it_docs"] == {"done": 50, "total": 50, "complete": True}
+        assert status["progress"]["training_data"]["complete"]
+        shadow = client.get_collection(shadow_collection_name("hr_it_docs", MODEL))
+        assert shadow.count() == source.count()
+        assert shadow.metadata["embedding_model"] == MODEL
+        assert shadow.metadata["index_name"] == "hr_it_docs"
+
+def test_catch_up_follows_source_changes():
+    """Records added or deleted while building are reflected before the switch"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        client = chromadb.PersistentClient(path=tmp_dir)
+        source = fill_collection(client, "hr_it_docs", 40)
+        migration = make_migration(client, {"hr_it_docs": "hr_it_docs"}, HashEmbeddings(), [])
+        migration._cancelled.clear()
+        migration.embeddings = HashEmbeddings()
+        migration._build("hr_it_docs")
+        source.add(ids=["late"], documents=["late upload"], embeddings=[HashEmbeddings().embed_query("late")])
+        source.delete(ids=["doc_0"])
+        migration._catch_up(throttle=False)
+        shadow = client.get_collection(shadow_collection_name("hr_it_docs", MODEL))
+        ids = set(shadow.get(include=[])["ids"])
+        assert "late" in ids and "doc_0" not in ids
+        assert len(ids) == source.count()
+
+def live_documents(client, name, question, n_results=4):
+    """Documents the live (old-model) collection returns for a question"""
+    return client.get_collection(name).query(
+        query_embeddings=[HashEmbeddings().embed_query("old " + question)],
+        n_results=n_results, include=["documents"]
+    )["documents"][0]
+
+def test_cancel_drops_shadows():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        client = chromadb.PersistentClient(path=tmp_dir)
+        fill_collection(client, "training_data", 8)
+        fill_collection(client, "hr_it_docs", 40)
+        switched = []
+        migration = make_migration(client, {"training_data": "training_data", "hr_it_docs": "hr_it_docs"},
+                                   HashEmbeddings(), switched, verify_seconds=None)
+        migration.start()
+        wait_for(lambda: migration.state == "verifying")
+
+        # Sampled live queries are compared against every shadow collection
+        question = "hr_it_docs document 3"
+        live = {name: live_documents(client, name, question) for name in ("training_data", "hr_it_docs")}
+        migration.shadow_query(question, live, 1.5)
+        shadow_status = migration.get_status()["shadow"]
+        assert shadow_status["queries"] == 1
+        assert shadow_status["live_p50_ms"] == 1.5
+        assert 0.0 <= shadow_status["mean_overlap"] <= 1.0
+        assert set(shadow_status["overlap_by_collection"]) == {"training_data", "hr_it_docs"}
+        assert None not in shadow_status["overlap_by_collection"].values()
+
+        # Without a confirmation, verification does not end on its own
+        time.sleep(migration_module.VERIFY_POLL_SECONDS * 2)
+        assert migration.state == "verifying"
+        migration.cancel()
+        assert migration.get_status()["state"] == "cancelled"
+        assert not migration.running
+        assert switched == []
+        assert collection_names(client) == {"training_data", "hr_it_docs"}
+
+def test_overlap_gate_and_confirmation():
+    """The switch waits for the overlap gate, and a confirmation overrides it"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        client = chromadb.PersistentClient(path=tmp_dir)
+        fill_collection(client, "hr_it_docs", 30)
+        sources = {"hr_it_docs": "hr_it_docs", "training_data": "training_data"}
+        switched = []
+        migration = make_migration(client, sources, HashEmbeddings(), switched, verify_seconds=0, min_overlap=0.9)
+        migration.start()
+        wait_for(lambda: migration.state == "verifying")
+        time.sleep(migration_module.VERIFY_POLL_SECONDS * 2)
+        assert migration.state == "verifying" and switched == [], "switched without any shadow samples"
+
+        # training_data has no source and no shadow, so it is skipped rather than queried
+        question = "hr_it_docs document 7"
+        shadow = client.get_collection(shadow_collection_name("hr_it_docs", MODEL))
+        matching = shadow.query(query_embeddings=[HashEmbeddings().embed_query(question)],
+                                n_results=4, include=["documents"])["documents"][0]
+        migration.shadow_query(question, {"hr_it_docs": matching, "training_data": []}, 1.0)
+        assert migration.get_status()["shadow"]["overlap_by_collection"] == {"hr_it_docs": 1.0, "training_data": None}
+        wait_for(lambda: not migration.running)
+        assert migration.state == "complete" and switched == [migration]
+
+        # A poor overlap keeps the migration verifying until an admin confirms
+        switched = []
+        other = EmbeddingMigration(
+            client, "third-model", lambda model_name: HashEmbeddings(), {"hr_it_docs": "hr_it_docs"},
+            lambda name, metadata: {**metadata, "embedding_model": "third-model", "index_name": name},
+            threading.Lock(), switched.append, rate_limit=10000.0, batch_size=8, verify_seconds=0, min_overlap=0.9
+        )
+        other.start()
+        wait_for(lambda: other.state == "verifying")
+        other.shadow_query(question, {"hr_it_docs": ["unrelated"] * 4}, 1.0)
+        time.sleep(migration_module.VERIFY_POLL_SECONDS * 2)
+        assert other.state == "verifying" and switched == []
+        other.confirm()
+        wait_for(lambda: not other.running)
+        assert other.state == "complete" and switched == [other]
+
+def test_cancel_while_switching_skips_the_switch():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        client = chromadb.PersistentClient(path=tmp_dir)
+        fill_collection(client, "hr_it_docs", 20)
+        lock = threading.Lock()
+        switched = []
+        migration = make_migration(client, {"hr_it_docs": "hr_it_docs"}, HashEmbeddings(), switched, lock=lock)
+        with lock:
+            # An upload holds the index lock while the migration is ready to switch
+            migration.start()
+            wait_for(lambda: migration.state == "switching")
+            canceller = threading.Thread(target=migration.cancel)
+            canceller.start()
+            wait_for(lambda: migration._cancelled.is_set())
+        canceller.join()
+        assert migration.state == "cancelled"
+        assert switched == []
+        assert collection_names(client) == {"hr_it_docs"}
+
+def test_failure_drops_shadows():
+    """A failed migration leaves no partial shadow collection behind"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        client = chromadb.PersistentClient(path=tmp_dir)
+        fill_collection(client, "hr_it_docs", 100)
+        switched = []
+        migration = make_migration(client, {"hr_it_docs": "hr_it_docs"}, HashEmbeddings(fail_after=3), switched)
+        migration.start()
+        wait_for(lambda: not migration.running)
+        status = migration.get_status()
+        assert status["state"] == "failed"
+        assert "model crashed" in status["error"]
+        assert switched == []
+        assert collection_names(client) == {"hr_it_docs"}
+
+def main():
+    print("Testing embedding model migration...")
+    test_completes_and_switches()
+    test_catch_up_follows_source_changes()
+    test_cancel_drops_shadows()
+    test_overlap_gate_and_confirmation()
+    test_cancel_while_switching_skips_the_switch()
+    test_failure_drops_shadows()
+    print("All migration tests passed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import os
+import sys
+from collections import OrderedDict
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from sessions import (
+    REWRITE_MAX_CHARS,
+    format_history,
+    get_session,
+    is_follow_up,
+    rank_chunks,
+    remember_question,
+    retrieve_for_session,
+    rewrite_follow_up,
+)
+
+def ask(session, text):
+    """Rewrite a question and record it the way /ask does"""
+    follow_up = is_follow_up(text, session)
+    rewritten = rewrite_follow_up(text, session)
+    remember_question(session, text, follow_up)
+    return rewritten
+
+def new_session():
+    return get_session(OrderedDict(), None, 0, ttl=3600)
+
+def test_session_expiry_and_eviction():
+    sessions = OrderedDict()
+    first = get_session(sessions, "a", 0, ttl=60, max_sessions=2, now=0)
+    assert get_session(sessions, "a", 0, ttl=60, max_sessions=2, now=30) is first
+    get_session(sessions, "b", 0, ttl=60, max_sessions=2, now=40)
+    get_session(sessions, "a", 0, ttl=60, max_sessions=2, now=50)
+    # "b" is now least recently used and is evicted by the third session
+    get_session(sessions, "c", 0, ttl=60, max_sessions=2, now=55)
+    assert list(sessions) == ["a", "c"]
+    # Both expire once idle longer than the ttl, and "a" starts over
+    renewed = get_session(sessions, "a", 0, ttl=60, max_sessions=2, now=200)
+    assert renewed is not first
+    assert list(sessions) == ["a"]
+
+def test_follow_ups_keep_the_topic():
+    session = new_session()
+    assert ask(session, "VPN policy?") == "VPN policy?"
+    assert ask(session, "And for contractors?") == "VPN policy? And for contractors?"
+    assert ask(session, "Is it mandatory?") == "VPN policy? And for contractors? Is it mandatory?"
+    # A new standalone question becomes the topic
+    assert ask(session, "How do I request time off?") == "How do I request time off?"
+    assert ask(session, "What about parental leave?") == "How do I request time off? What about parental leave?"
+    assert ask(session, "And maternity?") == "How do I request time off? What about parental leave? And maternity?"
+
+def test_new_topics_are_not_follow_ups():
+    session = new_session()
+    ask(session, "How do I request time off?")
+    for question in [
+        "What is your purpose?",
+        "Is there a dress code?",
+        "How do I reset my password if I forget it?",
+        "Which one is the holiday calendar?",
+    ]:
+        assert rewrite_follow_up(question, session) == question, question
+    assert rewrite_follow_up("Parental leave?", session) == "How do I request time off? Parental leave?"
+    assert rewrite_follow_up("It applies to contractors as well?", session).startswith("How do I request")
+    assert rewrite_follow_up("thanks", session) == "thanks"
+
+def test_rewrite_is_capped():
+    session = new_session()
+    ask(session, "How do I " + "really " * 100 + "request time off?")
+    ask(session, "And " + "for sick leave " * 10 + "?")
+    rewritten = rewrite_follow_up("Is it paid?", session)
+    assert len(rewritten) <= REWRITE_MAX_CHARS
+    assert rewritten.startswith("How do I really") and rewritten.endswith("Is it paid?")
+
+def test_history_token_budget():
+    session = new_session()
+    for i in range(6):
+        session["history"].append((f"Question {i}", "answer " * 100))
+    history = format_history(session, budget=400)
+    # Each turn costs ~180 tokens, so only the latest two fit, oldest first
+    assert "Question 3" not in history
+    assert history.index("Question 4") < history.index("Question 5")
+    assert format_history(session, budget=10) == ""
+
+def test_rank_chunks():
+    chunks = [("north", [0.0, 1.0]), ("east", [1.0, 0.0]), ("north-east", [0.7, 0.7])]
+    assert rank_chunks(chunks, [1.0, 0.0], 2) == ["east", "north-east"]
+    assert rank_chunks([], [1.0, 0.0], 2) == []
+
+def test_context_reuse_and_invalidation():
+    session = new_session()
+    fetched = []
+
+    def fetch(embedding):
+        fetched.append(embedding)
+        return {"hr_it_docs": [("chunk", embedding)]}
+
+    topic = np.array([1.0, 0.0])
+    _, reused = retrieve_for_session(session, topic, topic, 0, fetch)
+    assert not reused and len(fetched) == 1
+
+    # On topic: served from the session
+    close = np.array([0.9, 0.436])
+    chunks, reused = retrieve_for_session(session, close, close, 0, fetch)
+    assert reused and chunks == {"hr_it_docs": [("chunk", topic)]}
+
+    # The question as asked decides, not the rewrite that contains the old topic
+    off_topic = np.array([0.0, 1.0])
+    _, reused = retrieve_for_session(session, topic, off_topic, 0, fetch)
+    assert not reused and len(fetched) == 2
+
+    # A corpus change invalidates the cached chunks
+    _, reused = retrieve_for_session(session, topic, topic, 0, fetch)
+    assert reused
+    _, reused = retrieve_for_session(session, topic, topic, 1, fetch)
+    assert not reused and len(fetched) == 3
+
+def main():
+    print("Testing conversation sessions...")
+    test_session_expiry_and_eviction()
+    test_follow_ups_keep_the_topic()
+    test_new_topics_are_not_follow_ups()
+    test_rewrite_is_capped()
+    test_history_token_budget()
+    test_rank_chunks()
+    test_context_reuse_and_invalidation()
+    print("All session tests passed")
+
+if __name__ == "__main__":
+    main()
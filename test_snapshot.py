@@ -0,0 +1,159 @@
+import json
+import os
+import sys
+import tempfile
+import zipfile
+
+import chromadb
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from snapshot import SnapshotError, export_snapshot, import_snapshot, read_collection
+
+MODEL = "all-MiniLM-L6-v2"
+
+def make_client(tmp_dir, name):
+    return chromadb.PersistentClient(path=os.path.join(tmp_dir, name))
+
+def fill_collection(client, name, count, model=MODEL):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((count, 8)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    collection = client.create_collection(
+        name,
+        metadata={"hnsw:space": "cosine", "embedding_model": model, "chunk_size": 500}
+    )
+    collection.add(
+        ids=[f"doc_{i}" for i in range(count)],
+        documents=[f"Document {i}" for i in range(count)],
+        embeddings=vectors.tolist(),
+        metadatas=[{"page": i} for i in range(count)]
+    )
+    return vectors
+
+def test_round_trip():
+    """Exported collections import with the same ids, documents, metadata and vectors"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        source = make_client(tmp_dir, "source")
+        fill_collection(source, "hr_it_docs", 25)
+        path = os.path.join(tmp_dir, "index.snapshot")
+        manifest = export_snapshot(source, path)
+        assert manifest["embedding_model"] == MODEL
+        assert manifest["collections"]["hr_it_docs"]["chunking"] == {"chunk_size": 500}
+
+        target = make_client(tmp_dir, "target")
+        import_snapshot(target, path, MODEL, {"hr_it_docs": "hr_it_docs__copy"})
+        expected = read_collection(source.get_collection("hr_it_docs"))
+        imported = target.get_collection("hr_it_docs__copy")
+        actual = read_collection(imported)
+        assert actual[0] == expected[0]
+        assert actual[1] == expected[1]
+        assert actual[2] == expected[2]
+        np.testing.assert_allclose(actual[3], expected[3], rtol=1e-6)
+        assert imported.metadata["hnsw:space"] == "cosine"
+
+def test_rejects_other_embedding_model():
+    """A snapshot built with another model is refused and leaves the target untouched"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        source = make_client(tmp_dir, "source")
+        fill_collection(source, "hr_it_docs", 5, model="other-model")
+        path = os.path.join(tmp_dir, "index.snapshot")
+        export_snapshot(source, path)
+
+        target = make_client(tmp_dir, "target")
+        fill_collection(target, "hr_it_docs", 3)
+        try:
+            import_snapshot(target, path, MODEL)
+        except SnapshotError as e:
+            print(f"Rejected as expected: {e}")
+        else:
+            raise AssertionError("Snapshot with a different embedding model was imported")
+        assert target.get_collection("hr_it_docs").count() == 3
+
+def test_rejects_invalid_file():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "index.snapshot")
+        with open(path, "w") as file:
+            file.write("not a snapshot")
+        try:
+            import_snapshot(make_client(tmp_dir, "target"), path, MODEL)
+        except SnapshotError:
+            pass
+        else:
+            raise AssertionError("Invalid snapshot file was imported")
+
+def rewrite_records(path, name, edit):
+    """Copy a snapshot, passing one collection's records through edit()"""
+    with zipfile.ZipFile(path) as archive:
+        files = {item: archive.read(item) for item in archive.namelist()}
+    records = json.loads(files[f"{name}/records.json"])
+    edit(records)
+    files[f"{name}/records.json"] = json.dumps(records)
+    with zipfile.ZipFile(path, "w") as archive:
+        for item, data in files.items():
+            archive.writestr(item, data)
+
+def make_two_collection_snapshot(tmp_dir):
+    source = make_client(tmp_dir, "source")
+    fill_collection(source, "hr_it_docs", 5)
+    fill_collection(source, "training_data", 5)
+    path = os.path.join(tmp_dir, "index.snapshot")
+    export_snapshot(source, path)
+    target = make_client(tmp_dir, "target")
+    fill_collection(target, "hr_it_docs", 3)
+    fill_collection(target, "training_data", 3)
+    return path, target
+
+def assert_untouched(target):
+    assert sorted(col.name for col in target.list_collections()) == ["hr_it_docs", "training_data"]
+    assert target.get_collection("hr_it_docs").count() == 3
+    assert target.get_collection("training_data").count() == 3
+
+def test_corrupt_snapshot_is_rejected_up_front():
+    """A snapshot with one inconsistent collection replaces none of them"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path, target = make_two_collection_snapshot(tmp_dir)
+        rewrite_records(path, "training_data", lambda records: records["documents"].pop())
+        try:
+            import_snapshot(target, path, MODEL)
+        except SnapshotError as e:
+            print(f"Rejected as expected: {e}")
+        else:
+            raise AssertionError("Snapshot with mismatched record counts was imported")
+        assert_untouched(target)
+
+def test_failed_load_leaves_collections_in_place():
+    """If ChromaDB rejects a collection midway, the loaded ones are dropped, not swapped in"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path, target = make_two_collection_snapshot(tmp_dir)
+
+        def nest_metadata(records):
+            records["metadatas"] = [{"page": {"nested": i}} for i in range(len(records["ids"]))]
+
+        rewrite_records(path, "training_data", nest_metadata)
+        try:
+            import_snapshot(target, path, MODEL)
+        except Exception as e:
+            print(f"Failed as expected: {type(e).__name__}")
+        else:
+            raise AssertionError("Snapshot with invalid metadata was imported")
+        assert_untouched(target)
+
+        # A valid import afterwards replaces both
+        path, _ = make_two_collection_snapshot(os.path.join(tmp_dir, "again"))
+        import_snapshot(target, path, MODEL)
+        assert target.get_collection("training_data").count() == 5
+        assert sorted(col.name for col in target.list_collections()) == ["hr_it_docs", "training_data"]
+
+def main():
+    print("Testing index snapshots...")
+    test_round_trip()
+    test_rejects_other_embedding_model()
+    test_rejects_invalid_file()
+    test_corrupt_snapshot_is_rejected_up_front()
+    test_failed_load_leaves_collections_in_place()
+    print("All snapshot tests passed")
+
+if __name__ == "__main__":
+    main()